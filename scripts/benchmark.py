@@ -0,0 +1,287 @@
+#!/usr/bin/env python
+###############################################################################
+# Name: benchmark.py                                                          #
+# Purpose: Time the puzzle solver against a file of puzzle data              #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2008 Cody Precord <staff@editra.org>                         #
+# License: wxWindows License                                                  #
+###############################################################################
+
+""""
+Benchmark
+
+Solves every puzzle in a puzzle data file (see puzzle2py.py for the format)
+with each of the solver engines, searching the propagation engines both on
+copies of the state and with trail based undo, and reports the solve throughput and search counters
+of each configuration per difficulty level. The bitmask engine is also run
+at each propagation level to weigh the cost per search node against the
+nodes saved, and with each of the search heuristics to find the fastest one
+for each difficulty level. When numpy is available the whole file is also solved at once
+with the vectorized solver.
+
+When a number of workers is given only the race mode is run instead. Each of
+the first puzzles of the Hard and Evil levels is solved once in this process
+and once with batch.RaceSolve, which splits the top of its search tree over
+the workers, and the latency of the two is compared.
+
+Example:
+
+  python benchmark.py puzzles.dat
+  python benchmark.py puzzles.dat 4
+
+@summary: Time the puzzle solver engines
+
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__revision__ = "$Revision$"
+__scid__ = "$Id$"
+
+#-----------------------------------------------------------------------------#
+# Imports
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+# Local Imports
+from puzzle2py import DIFFICULTIES, ReadPuzzles
+from sudoku import batch
+from sudoku import solver
+
+try:
+    from sudoku import vecsolve
+except ImportError:
+    # numpy is not installed
+    vecsolve = None
+
+#-----------------------------------------------------------------------------#
+# Globals
+
+# Number of puzzles per level raced, each race starts a new pool
+RACE_COUNT = 20
+
+# Levels the race mode is run on
+RACE_LEVELS = ('Hard', 'Evil')
+
+# (name, engine, trail)
+ENGINES = (('dict-copy', solver.ENGINE_DICT, False),
+           ('dict-trail', solver.ENGINE_DICT, True),
+           ('bitmask-copy', solver.ENGINE_BITMASK, False),
+           ('bitmask-trail', solver.ENGINE_BITMASK, True),
+           ('dlx', solver.ENGINE_DLX, True))
+
+# (name, propagation level)
+PROPAGATION = (('singles', solver.PROPAGATE_SINGLES),
+               ('pointing', solver.PROPAGATE_POINTING),
+               ('pairs', solver.PROPAGATE_PAIRS),
+               ('triples', solver.PROPAGATE_TRIPLES))
+
+# Nodes before the first restart of the restarting search
+RESTART_CUTOFF = 50
+
+# (name, branching rule, value order, restart cutoff)
+HEURISTICS = (('mrv', solver.BRANCH_MRV, solver.ORDER_DIGITS, None),
+              ('mrv-degree', solver.BRANCH_MRV_DEGREE, solver.ORDER_DIGITS,
+               None),
+              ('rarest-digit', solver.BRANCH_RAREST, solver.ORDER_DIGITS,
+               None),
+              ('mrv-lcv', solver.BRANCH_MRV, solver.ORDER_LCV, None),
+              ('restarts', solver.BRANCH_MRV, solver.ORDER_DIGITS,
+               RESTART_CUTOFF))
+
+#-----------------------------------------------------------------------------#
+# Functions
+
+def PrintHelp():
+    """Print help message on how to use this script"""
+    print "Benchmark - Time the puzzle solver engines"
+    print "Type `benchmark datafile [raceworkers]`"
+
+def RaceLevels(pdict, workers):
+    """Time racing the split search of each puzzle of the hard levels
+    against solving it in one process and print the results.
+    @param pdict: dict of difficulty => puzzles
+    @param workers: number of worker processes to race with
+
+    """
+    for name in RACE_LEVELS:
+        puzzles = pdict.get(DIFFICULTIES[name], [])[:RACE_COUNT]
+        if not len(puzzles):
+            continue
+
+        print "%s (%d puzzles, %d workers)" % (name, len(puzzles), workers)
+        single, raced, agreed = TimeRace(puzzles, workers)
+        for label, times in (('single', single), ('race', raced)):
+            times = sorted(times)
+            print "  %-13s total %8.3fs  median %8.2fms  max %8.2fms" % \
+                  (label, sum(times), times[len(times) // 2] * 1000,
+                   times[-1] * 1000)
+        print "  %-13s %6.2fx  (%d of %d solutions agree)" % \
+              ('speedup', sum(single) / max(sum(raced), 1e-9), agreed,
+               len(puzzles))
+
+def TimeEngine(puzzles, engine, trail=False,
+               propagation=solver.PROPAGATE_SINGLES):
+    """Solve all the puzzles with the given engine
+    @param puzzles: list of puzzle strings
+    @param engine: solver engine id
+    @keyword trail: use trail based undo in the search
+    @keyword propagation: propagation level of the search
+    @return: (seconds, number of puzzles solved, summed search counters)
+
+    """
+    solved = 0
+    counters = dict(nodes=0, copies=0, trailed=0, restarts=0)
+    start = time.time()
+    for puzzle in puzzles:
+        psolver = solver.SudokuSolver(puzzle, engine, trail,
+                                      propagation=propagation)
+        if psolver.GetSolution() is not None:
+            solved += 1
+        for key, val in psolver.GetCounters().iteritems():
+            counters[key] += val
+    return (time.time() - start, solved, counters)
+
+def TimeHeuristic(puzzles, branching, order, restarts=None):
+    """Solve all the puzzles with the bitmask engine and a search heuristic
+    @param puzzles: list of puzzle strings
+    @param branching: branching rule
+    @param order: value order
+    @keyword restarts: node cutoff of the first restart or None
+    @return: (seconds, number of puzzles solved, summed search counters)
+
+    """
+    solved = 0
+    counters = dict(nodes=0, copies=0, trailed=0, restarts=0)
+    start = time.time()
+    for puzzle in puzzles:
+        psolver = solver.SudokuSolver(puzzle, solver.ENGINE_BITMASK)
+        psolver.SetBranching(branching)
+        psolver.SetValueOrder(order)
+        psolver.SetRestarts(restarts, seed=0)
+        if psolver.GetSolution() is not None:
+            solved += 1
+        for key, val in psolver.GetCounters().iteritems():
+            counters[key] += val
+    return (time.time() - start, solved, counters)
+
+def TimeRace(puzzles, workers):
+    """Solve each puzzle with the bitmask engine in this process and with
+    batch.RaceSolve.
+    @param puzzles: list of puzzle strings
+    @param workers: number of worker processes to race with
+    @return: (list of single solve seconds, list of race seconds,
+              number of puzzles both found the same solution for)
+
+    """
+    single = list()
+    raced = list()
+    agreed = 0
+    for puzzle in puzzles:
+        start = time.time()
+        solution = solver.SudokuSolver(puzzle,
+                                       solver.ENGINE_BITMASK).GetSolution()
+        single.append(time.time() - start)
+        if solution is not None:
+            solution = ''.join(solution)
+
+        start = time.time()
+        result = batch.RaceSolve(puzzle, workers)
+        raced.append(time.time() - start)
+        if result == solution:
+            agreed += 1
+    return (single, raced, agreed)
+
+def TimeVectorized(puzzles):
+    """Solve all the puzzles at once with the vectorized solver
+    @param puzzles: list of puzzle strings
+    @return: (seconds, number of puzzles solved)
+
+    """
+    start = time.time()
+    results = vecsolve.SolveBoards(puzzles)
+    return (time.time() - start, len(results) - results.count(None))
+
+#-----------------------------------------------------------------------------#
+# Main
+
+if __name__ == '__main__':
+    # Check Args
+    if len(sys.argv) not in (2, 3) or \
+       (len(sys.argv) == 3 and not sys.argv[2].isdigit()):
+        PrintHelp()
+        sys.exit()
+
+    pdict = ReadPuzzles(sys.argv[1])
+    if len(sys.argv) == 3:
+        RaceLevels(pdict, int(sys.argv[2]))
+        sys.exit()
+
+    names = dict((val, key) for key, val in DIFFICULTIES.iteritems())
+    for diff in sorted(pdict.keys()):
+        puzzles = pdict[diff]
+        if not len(puzzles):
+            continue
+
+        print "%s (%d puzzles)" % (names[diff], len(puzzles))
+        baseline = None
+        for name, engine, trail in ENGINES:
+            secs, solved, counters = TimeEngine(puzzles, engine, trail)
+            if baseline is None:
+                baseline = secs
+            print "  %-13s %8.3fs %10.1f puzzles/s %6.1fx  (%d solved)" % \
+                  (name, secs, len(puzzles) / max(secs, 1e-9),
+                   baseline / max(secs, 1e-9), solved)
+            print "  %13s nodes: %d  copies: %d  trailed: %d" % \
+                  ('', counters['nodes'], counters['copies'],
+                   counters['trailed'])
+
+        # Stronger propagation makes nodes slower but there are fewer
+        baseline = None
+        for name, level in PROPAGATION:
+            secs, solved, counters = TimeEngine(puzzles,
+                                                solver.ENGINE_BITMASK,
+                                                propagation=level)
+            if baseline is None:
+                baseline = secs
+            nodes = counters['nodes']
+            print "  %-13s %8.3fs %10.1f puzzles/s %6.1fx  (%d solved)" % \
+                  (name, secs, len(puzzles) / max(secs, 1e-9),
+                   baseline / max(secs, 1e-9), solved)
+            print "  %13s nodes: %d  %.1fus/node" % \
+                  ('', nodes, secs * 1000000 / max(nodes, 1))
+
+        # Branching rules, value orders and restarts
+        baseline = fastest = None
+        for name, branching, order, restarts in HEURISTICS:
+            secs, solved, counters = TimeHeuristic(puzzles, branching, order,
+                                                   restarts)
+            if baseline is None:
+                baseline = secs
+            if fastest is None or secs < fastest[1]:
+                fastest = (name, secs)
+            print "  %-13s %8.3fs %10.1f puzzles/s %6.1fx  (%d solved)" % \
+                  (name, secs, len(puzzles) / max(secs, 1e-9),
+                   baseline / max(secs, 1e-9), solved)
+            print "  %13s nodes: %d  restarts: %d" % \
+                  ('', counters['nodes'], counters['restarts'])
+        print "  fastest heuristic: %s" % fastest[0]
+
+    # Compare a per board loop with solving the whole collection as arrays
+    if vecsolve is not None:
+        puzzles = list()
+        for diff in sorted(pdict.keys()):
+            puzzles.extend(pdict[diff])
+
+        print "All (%d puzzles)" % len(puzzles)
+        base, solved, counters = TimeEngine(puzzles, solver.ENGINE_BITMASK)
+        print "  %-13s %8.3fs %10.1f puzzles/s %6.1fx  (%d solved)" % \
+              ('bitmask-loop', base, len(puzzles) / max(base, 1e-9),
+               1.0, solved)
+        secs, solved = TimeVectorized(puzzles)
+        print "  %-13s %8.3fs %10.1f puzzles/s %6.1fx  (%d solved)" % \
+              ('vectorized', secs, len(puzzles) / max(secs, 1e-9),
+               base / max(secs, 1e-9), solved)
@@ -0,0 +1,297 @@
+#!/usr/bin/env python
+###############################################################################
+# Name: benchsuite.py                                                         #
+# Purpose: Time the solver, board and loading hot paths and catch regressions #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2008 Cody Precord <staff@editra.org>                         #
+# License: wxWindows License                                                  #
+###############################################################################
+
+""""
+Bench Suite
+
+Times the hot paths of the game on fixed sets of puzzles taken from the
+puzzles.dat data file next to this script and the built in puzzle database:
+
+  - solve.<difficulty>: SudokuSolver.GetSolution for each difficulty
+  - board.iscomplete: PuzzleBoard.IsComplete on solved boards
+  - board.str: PuzzleBoard.__str__
+  - board.unitvalues: PuzzleBoard.GetRowValues, GetColumnValues and
+    GetBlockValues for every unit of a board
+  - board.samecells: PuzzleBoard.GetCellsSameRow, GetCellsSameColumn and
+    GetCellsSameBlock for every cell of a board
+  - codec.nibbles / codec.givens: puzzle.EncodeNibbles and DecodeNibbles,
+    EncodeGivens and DecodeGivens
+  - manager.load: PuzzleManager.LoadPuzzles on the data file
+  - file.write / file.read: sudoku_cmn.WritePuzzleFile and ReadPuzzleFile
+    (only when wx can be imported)
+
+Each benchmark is run a number of times and the best time is kept. The
+results can be written to a JSON file and compared against the results of an
+earlier run, in which case the script exits with a status of 1 if any
+benchmark got slower than the allowed threshold.
+
+Example:
+
+  python benchsuite.py -o before.json
+  python benchsuite.py -b before.json -t 0.15 -o after.json
+
+@summary: Time the hot paths of the game and catch regressions
+
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__revision__ = "$Revision$"
+__scid__ = "$Id$"
+
+#-----------------------------------------------------------------------------#
+# Imports
+import os
+import sys
+import time
+import json
+import tempfile
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+# Local Imports
+from puzzle2py import DIFFICULTIES, ReadPuzzles
+from sudoku import puzzle
+from sudoku import solver
+from sudoku.puzzledb import PUZZLES
+
+try:
+    from sudoku import sudoku_cmn
+except ImportError:
+    # wx is not installed
+    sudoku_cmn = None
+
+#-----------------------------------------------------------------------------#
+# Globals
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'puzzles.dat')
+
+DEFAULT_COUNT = 200         # Puzzles per corpus
+DEFAULT_REPEAT = 3          # Runs per benchmark, the best one is kept
+DEFAULT_THRESHOLD = 0.10    # Allowed slow down before failing (10%)
+
+#-----------------------------------------------------------------------------#
+# Functions
+
+def CompareResults(results, baseline, threshold):
+    """Print how each benchmark compares to a baseline run
+    @param results: dict of name => result
+    @param baseline: dict of name => result
+    @param threshold: allowed slow down as a fraction of the baseline time
+    @return: list of the names of the benchmarks that regressed
+
+    """
+    regressed = list()
+    for name in sorted(results.keys()):
+        if name not in baseline:
+            print "  %-20s (new)" % name
+            continue
+
+        old = baseline[name]['seconds']
+        ratio = results[name]['seconds'] / max(old, 1e-9)
+        if ratio > 1.0 + threshold:
+            regressed.append(name)
+            status = 'REGRESSED'
+        else:
+            status = 'ok'
+        print "  %-20s %6.2fx  %s" % (name, ratio, status)
+    return regressed
+
+def GetCorpora(count):
+    """Get the fixed sets of puzzles the benchmarks run on
+    @param count: max number of puzzles per set
+    @return: (dict of difficulty name => puzzles from the data file,
+              puzzles from the built in database,
+              solutions of those puzzles)
+
+    """
+    names = dict((val, key) for key, val in DIFFICULTIES.iteritems())
+    pdict = ReadPuzzles(DATA_FILE)
+    solves = dict()
+    for diff in sorted(pdict.keys()):
+        if len(pdict[diff]):
+            solves[names[diff]] = pdict[diff][:count]
+
+    builtin = list()
+    for diff in sorted(PUZZLES.keys()):
+        builtin.extend(PUZZLES[diff][:count])
+    builtin = builtin[:count]
+
+    solutions = list()
+    for grid in builtin:
+        result = solver.SudokuSolver(grid, solver.ENGINE_BITMASK).GetSolution()
+        solutions.append(''.join(result))
+    return solves, builtin, solutions
+
+def MakeBoard(grid):
+    """Build a puzzle board like the game canvas does
+    @param grid: 81 character puzzle or solution string
+    @return: L{puzzle.PuzzleBoard}
+
+    """
+    board = puzzle.PuzzleBoard(state=grid)
+    board.SetCellRects([((idx % 9) * 20, (idx // 9) * 20, 20, 20)
+                        for idx in range(81)])
+    return board
+
+def PrintHelp():
+    """Print help message on how to use this script"""
+    print "Bench Suite - Time the hot paths of the game"
+    print "Type `benchsuite [-o results.json] [-b baseline.json] [-t 0.1]`"
+
+def RunBenchmarks(count, repeat):
+    """Run every benchmark
+    @param count: max number of puzzles per corpus
+    @param repeat: number of runs per benchmark
+    @return: dict of name => dict(seconds=float, items=int)
+
+    """
+    solves, builtin, solutions = GetCorpora(count)
+    benchmarks = list()
+
+    for name, puzzles in sorted(solves.iteritems()):
+        def solve(puzzles=puzzles):
+            for grid in puzzles:
+                solver.SudokuSolver(grid, solver.ENGINE_BITMASK).GetSolution()
+        benchmarks.append(('solve.' + name.lower(), solve, len(puzzles)))
+
+    solved = [MakeBoard(grid) for grid in solutions]
+    def iscomplete():
+        for board in solved:
+            board.IsComplete()
+    benchmarks.append(('board.iscomplete', iscomplete, len(solved)))
+
+    boards = [MakeBoard(grid) for grid in builtin]
+    def tostr():
+        for board in boards:
+            str(board)
+    benchmarks.append(('board.str', tostr, len(boards)))
+
+    def unitvalues():
+        for board in boards:
+            for unit in range(board.size):
+                board.GetRowValues(unit)
+                board.GetColumnValues(unit)
+                board.GetBlockValues(unit)
+    benchmarks.append(('board.unitvalues', unitvalues, len(boards)))
+
+    def samecells():
+        for board in boards[:20]:
+            for cell in range(len(board)):
+                board.GetCellsSameRow(cell)
+                board.GetCellsSameColumn(cell)
+                board.GetCellsSameBlock(cell)
+    benchmarks.append(('board.samecells', samecells, min(len(boards), 20)))
+
+    def nibbles():
+        for grid in builtin:
+            puzzle.DecodeNibbles(puzzle.EncodeNibbles(grid))
+    benchmarks.append(('codec.nibbles', nibbles, len(builtin)))
+
+    def givens():
+        for grid in builtin:
+            puzzle.DecodeGivens(puzzle.EncodeGivens(grid))
+    benchmarks.append(('codec.givens', givens, len(builtin)))
+
+    manager = puzzle.PuzzleManager()
+    def load():
+        manager.LoadPuzzles(DATA_FILE)
+    benchmarks.append(('manager.load', load, 1))
+
+    if sudoku_cmn is not None:
+        handle, path = tempfile.mkstemp('.sudoku')
+        os.close(handle)
+        states = [dict(initial=grid, current=grid, moves=0, hints=0, time=0)
+                  for grid in builtin]
+        def write():
+            for state in states:
+                sudoku_cmn.WritePuzzleFile(path, state)
+        def read():
+            for state in states:
+                sudoku_cmn.ReadPuzzleFile(path)
+        benchmarks.append(('file.write', write, len(states)))
+        benchmarks.append(('file.read', read, len(states)))
+    else:
+        path = None
+        print "wx is not installed, skipping the puzzle file benchmarks"
+
+    results = dict()
+    try:
+        for name, func, items in benchmarks:
+            secs = TimeBest(func, repeat)
+            results[name] = dict(seconds=secs, items=items)
+            print "  %-20s %9.4fs %10.1fus/item" % \
+                  (name, secs, secs * 1000000 / max(items, 1))
+    finally:
+        if path is not None:
+            os.remove(path)
+    return results
+
+def TimeBest(func, repeat):
+    """Time the best of a number of runs of a function
+    @param func: callable
+    @param repeat: number of runs
+    @return: seconds
+
+    """
+    best = None
+    for run in range(max(repeat, 1)):
+        start = time.time()
+        func()
+        secs = time.time() - start
+        if best is None or secs < best:
+            best = secs
+    return best
+
+#-----------------------------------------------------------------------------#
+# Main
+
+if __name__ == '__main__':
+    parser = OptionParser(usage="%prog [options]")
+    parser.add_option('-o', '--output', dest='output', default=None,
+                      help="write the results to a JSON file")
+    parser.add_option('-b', '--baseline', dest='baseline', default=None,
+                      help="JSON results of an earlier run to compare with")
+    parser.add_option('-t', '--threshold', dest='threshold', type='float',
+                      default=DEFAULT_THRESHOLD,
+                      help="allowed slow down as a fraction (default 0.1)")
+    parser.add_option('-r', '--repeat', dest='repeat', type='int',
+                      default=DEFAULT_REPEAT,
+                      help="runs per benchmark, the best is kept")
+    parser.add_option('-n', '--count', dest='count', type='int',
+                      default=DEFAULT_COUNT,
+                      help="number of puzzles per corpus")
+    options, args = parser.parse_args()
+    if args:
+        PrintHelp()
+        sys.exit(2)
+
+    print "Running benchmarks (best of %d)" % options.repeat
+    results = RunBenchmarks(options.count, options.repeat)
+
+    if options.output is not None:
+        fhandle = open(options.output, 'w')
+        json.dump(dict(count=options.count, repeat=options.repeat,
+                       results=results), fhandle, indent=2, sort_keys=True)
+        fhandle.close()
+        print "Wrote %s" % options.output
+
+    if options.baseline is not None:
+        fhandle = open(options.baseline, 'r')
+        baseline = json.load(fhandle)['results']
+        fhandle.close()
+
+        print "Compared with %s (threshold %d%%)" % \
+              (options.baseline, options.threshold * 100)
+        regressed = CompareResults(results, baseline, options.threshold)
+        if regressed:
+            print "Regressed: %s" % ", ".join(regressed)
+            sys.exit(1)
@@ -21,6 +21,9 @@ The puzzle data file must be organized as follows:
 Difficulty lables are signified by a '#' (i.e. # Easy). The acceptible labels
 are as follows (Easy, Normal, Hard, Evil).
 
+Puzzles that are equivalent to one earlier in the file, by a symmetry of the
+grid or a relabeling of the digits, are dropped.
+
 Example:
 
 # Easy
@@ -36,8 +39,15 @@ __scid__ = "$Id$"
 
 #-----------------------------------------------------------------------------#
 # Imports
+import os
 import sys
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+# Local Imports
+from sudoku import canon
+
 #-----------------------------------------------------------------------------#
 # Globals
 
@@ -72,6 +82,26 @@ def PrintHelp():
     print "Puzzle2Py - Convert Puzzle Data to a Python Module"
     print "Type `puzzle2py datafile outfile.py`"
 
+def RemoveDuplicates(pdict):
+    """Remove the puzzles that have the same canonical form as another one,
+    keeping the one in the easiest difficulty level.
+    @param pdict: {difficulty : [puzzle strings]}
+    @return: number of puzzles removed
+
+    """
+    removed = 0
+    seen = set()
+    for diff in sorted(pdict.keys()):
+        unique = list()
+        for puzzle in pdict[diff]:
+            key = canon.Canonicalize(puzzle)[0]
+            if key not in seen:
+                seen.add(key)
+                unique.append(puzzle)
+        removed += len(pdict[diff]) - len(unique)
+        pdict[diff] = unique
+    return removed
+
 def ReadPuzzles(fname):
     """Load the game boards from a puzzle data file. The data file must
     contain puzzles that are in the standard compact form, with one puzzle
@@ -115,6 +145,7 @@ if __name__ == '__main__':
     pdict = ReadPuzzles(sys.argv[1])
     print "Found %d puzzles in the data file %s" % \
           (sum(len(val) for val in pdict.values()), sys.argv[1])
+    print "Removed %d duplicate puzzles" % RemoveDuplicates(pdict)
 
     # Create Code String
     print "Generating Code..."
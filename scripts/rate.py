@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+###############################################################################
+# Name: rate.py                                                               #
+# Purpose: Measure the difficulty of every puzzle in a collection            #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2008 Cody Precord <staff@editra.org>                         #
+# License: wxWindows License                                                  #
+###############################################################################
+
+""""
+Rate
+
+Rates every puzzle in a puzzle data file (see puzzle2py.py for the format),
+or the built in puzzles if no file is given, by solving it with the human
+strategies on a pool of worker processes. The hardest strategy needed, the
+number of deductions and the number of search nodes used when the strategies
+got stuck are written to a sidecar ratings file next to the data file
+(datafile.ratings), which the PuzzleManager can bucket the puzzles by.
+
+Example:
+
+  python rate.py 4 puzzles.dat
+
+@summary: Measure the difficulty of a puzzle collection
+
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__revision__ = "$Revision$"
+__scid__ = "$Id$"
+
+#-----------------------------------------------------------------------------#
+# Imports
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+# Local Imports
+from puzzle2py import ReadPuzzles, DIFFICULTIES
+from sudoku import batch
+from sudoku import puzzle
+from sudoku import strategy
+from sudoku.puzzledb import PUZZLES
+
+#-----------------------------------------------------------------------------#
+# Functions
+
+def PrintHelp():
+    """Print help message on how to use this script"""
+    print "Rate - Measure the difficulty of every puzzle in a collection"
+    print "Type `rate workers [datafile]`"
+
+#-----------------------------------------------------------------------------#
+# Main
+
+if __name__ == '__main__':
+    # Check Args
+    if len(sys.argv) not in (2, 3) or not sys.argv[1].isdigit():
+        PrintHelp()
+        sys.exit()
+
+    workers = int(sys.argv[1])
+    if len(sys.argv) == 3:
+        pdict = ReadPuzzles(sys.argv[2])
+        outfile = sys.argv[2] + puzzle.RATINGS_EXT
+    else:
+        pdict = PUZZLES
+        outfile = puzzle.RATINGS_FILE
+
+    puzzles = list()
+    labels = list()
+    for diff in sorted(pdict.keys()):
+        puzzles.extend(pdict[diff])
+        labels.extend([diff] * len(pdict[diff]))
+
+    print "Rating %d puzzles with %d workers" % (len(puzzles), workers)
+    ratings = [None] * len(puzzles)
+    start = time.time()
+    for idx, rating in batch.RateMany(puzzles, workers, 64, ordered=False):
+        ratings[idx] = rating
+    secs = time.time() - start
+    print "Finished in %.3fs (%.1f puzzles/s)" % \
+          (secs, len(puzzles) / max(secs, 1e-9))
+
+    puzzle.WriteRatings(zip(puzzles, ratings), outfile)
+    print "Wrote %s" % outfile
+
+    # Compare the measured difficulty with the hand assigned one
+    names = dict((val, key) for key, val in DIFFICULTIES.iteritems())
+    table = dict()
+    for label, rating in zip(labels, ratings):
+        key = (label, strategy.GetDifficulty(rating))
+        table[key] = table.get(key, 0) + 1
+
+    print "%-8s" % "" + "".join(["%8s" % names[diff]
+                                 for diff in sorted(names.keys())])
+    for label in sorted(pdict.keys()):
+        print "%-8s" % names[label] + \
+              "".join(["%8d" % table.get((label, diff), 0)
+                       for diff in sorted(names.keys())])
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+###############################################################################
+# Name: searchstats.py                                                        #
+# Purpose: Histograms of the solvers search statistics over a collection     #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2008 Cody Precord <staff@editra.org>                         #
+# License: wxWindows License                                                  #
+###############################################################################
+
+""""
+Search Stats
+
+Solves every puzzle in the built in puzzle database, or in a puzzle data file
+(see puzzle2py.py for the format), on a pool of worker processes with the
+solvers statistics turned on. Prints a histogram of each counter and the
+puzzles that needed the most search nodes, to find the boards that blow up
+the search time and to measure changes to the solver.
+
+Example:
+
+  python searchstats.py 4
+  python searchstats.py 4 puzzles.dat
+
+@summary: Histograms of the solvers search statistics over a collection
+
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__revision__ = "$Revision$"
+__scid__ = "$Id$"
+
+#-----------------------------------------------------------------------------#
+# Imports
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+# Local Imports
+from puzzle2py import ReadPuzzles
+from sudoku import batch
+from sudoku import solver
+from sudoku.puzzledb import PUZZLES
+
+#-----------------------------------------------------------------------------#
+# Globals
+
+# Number of the hardest puzzles to list
+WORST = 10
+
+# Width of the longest bar in the histograms
+BAR_WIDTH = 40
+
+#-----------------------------------------------------------------------------#
+# Functions
+
+def PrintHelp():
+    """Print help message on how to use this script"""
+    print "Search Stats - Histograms of the solvers search statistics"
+    print "Type `searchstats workers [datafile]`"
+
+def PrintHistogram(histogram, field):
+    """Print the histogram of one counter
+    @param histogram: L{batch.StatsHistogram}
+    @param field: name of a L{solver.SolverStats} counter
+
+    """
+    buckets = histogram.GetBuckets(field)
+    if field == 'time':
+        print "%s (us): mean %.1f max %.1f" % \
+              (field, histogram.GetMean(field) * 1000000,
+               histogram.GetMax(field) * 1000000)
+    else:
+        print "%s: mean %.1f max %d" % \
+              (field, histogram.GetMean(field), histogram.GetMax(field))
+
+    most = max([count for low, high, count in buckets] + [1])
+    for low, high, count in buckets:
+        bar = '#' * max(1, count * BAR_WIDTH // most)
+        print "  %8d - %-8d %6d %s" % (low, high - 1, count, bar)
+    print
+
+#-----------------------------------------------------------------------------#
+# Main
+
+if __name__ == '__main__':
+    # Check Args
+    if len(sys.argv) not in (2, 3) or not sys.argv[1].isdigit():
+        PrintHelp()
+        sys.exit()
+
+    workers = int(sys.argv[1])
+    if len(sys.argv) == 3:
+        pdict = ReadPuzzles(sys.argv[2])
+    else:
+        pdict = PUZZLES
+
+    puzzles = list()
+    for diff in sorted(pdict.keys()):
+        puzzles.extend(pdict[diff])
+
+    print "Solving %d puzzles with %d workers" % (len(puzzles), workers)
+    histogram = batch.StatsHistogram()
+    worst = list()
+    start = time.time()
+    for idx, stats in batch.ProfileMany(puzzles, workers, 64, ordered=False):
+        histogram.Add(stats)
+        worst.append((stats.nodes, stats.time, idx))
+    secs = time.time() - start
+    print "Finished in %.3fs" % secs
+    print
+
+    for field in solver.SolverStats.FIELDS:
+        PrintHistogram(histogram, field)
+
+    print "Most search nodes:"
+    worst.sort(reverse=True)
+    for nodes, secs, idx in worst[:WORST]:
+        print "  %s %6d nodes %8.2fms" % (puzzles[idx], nodes, secs * 1000)
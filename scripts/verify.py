@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+###############################################################################
+# Name: verify.py                                                             #
+# Purpose: Check that every puzzle in a collection can be solved              #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2008 Cody Precord <staff@editra.org>                         #
+# License: wxWindows License                                                  #
+###############################################################################
+
+""""
+Verify
+
+Solves every puzzle in the built in puzzle database, or in a puzzle data file
+(see puzzle2py.py for the format), on a pool of worker processes and reports
+any puzzles that have no solution.
+
+Example:
+
+  python verify.py 4
+  python verify.py 4 puzzles.dat
+
+@summary: Check that every puzzle in a collection can be solved
+
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__revision__ = "$Revision$"
+__scid__ = "$Id$"
+
+#-----------------------------------------------------------------------------#
+# Imports
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+# Local Imports
+from puzzle2py import ReadPuzzles
+from sudoku import batch
+from sudoku.puzzledb import PUZZLES
+
+#-----------------------------------------------------------------------------#
+# Functions
+
+def PrintHelp():
+    """Print help message on how to use this script"""
+    print "Verify - Check that every puzzle in a collection can be solved"
+    print "Type `verify workers [datafile]`"
+
+#-----------------------------------------------------------------------------#
+# Main
+
+if __name__ == '__main__':
+    # Check Args
+    if len(sys.argv) not in (2, 3) or not sys.argv[1].isdigit():
+        PrintHelp()
+        sys.exit()
+
+    workers = int(sys.argv[1])
+    if len(sys.argv) == 3:
+        pdict = ReadPuzzles(sys.argv[2])
+    else:
+        pdict = PUZZLES
+
+    puzzles = list()
+    for diff in sorted(pdict.keys()):
+        puzzles.extend(pdict[diff])
+
+    print "Solving %d puzzles with %d workers" % (len(puzzles), workers)
+    failed = 0
+    start = time.time()
+    for idx, solution in batch.SolveMany(puzzles, workers, ordered=False):
+        if solution is None:
+            failed += 1
+            print "No solution: %s" % puzzles[idx]
+    secs = time.time() - start
+
+    print "Finished in %.3fs (%.1f puzzles/s), %d failed" % \
+          (secs, len(puzzles) / max(secs, 1e-9), failed)
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,303 @@
+###############################################################################
+# Name: batch.py                                                              #
+# Purpose: Solve large numbers of puzzles on a pool of worker processes       #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2008 Cody Precord <staff@editra.org>                         #
+# License: wxWindows License                                                  #
+###############################################################################
+
+"""
+Batch solving and rating of puzzles for whole puzzle collections.
+The work is spread across a pool of processes so that it scales with the
+number of available cores.
+
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__revision__ = "$Revision$"
+__scid__ = "$Id$"
+
+#-----------------------------------------------------------------------------#
+# Imports
+import multiprocessing
+
+# Local Imports
+import solver
+import solvecache
+import strategy
+
+#-----------------------------------------------------------------------------#
+# Globals
+
+# Solver engine used by the current worker process
+_ENGINE = solver.ENGINE_BITMASK
+
+# Solution cache opened by the current worker process
+_CACHE = None
+
+# Parts of the search tree per worker in a race, more parts than workers
+# keeps all of them busy when some parts are finished early.
+RACE_PARTS = 4
+
+#-----------------------------------------------------------------------------#
+
+class StatsHistogram(object):
+    """Aggregate of the L{solver.SolverStats} of many searches, with a
+    histogram of each counter in power of two buckets. Times are bucketed
+    in microseconds.
+
+    """
+    def __init__(self):
+        object.__init__(self)
+
+        # Attributes
+        self._count = 0
+        self._totals = dict([(field, 0) for field in solver.SolverStats.FIELDS])
+        self._maxes = dict(self._totals)
+        self._buckets = dict([(field, dict())
+                              for field in solver.SolverStats.FIELDS])
+
+    def Add(self, stats):
+        """Add the stats of one search
+        @param stats: L{solver.SolverStats}
+
+        """
+        self._count += 1
+        for field, value in stats.GetDict().iteritems():
+            self._totals[field] += value
+            self._maxes[field] = max(self._maxes[field], value)
+            if field == 'time':
+                value = int(value * 1000000)
+            bucket = 0
+            while value >= (1 << bucket):
+                bucket += 1
+            buckets = self._buckets[field]
+            buckets[bucket] = buckets.get(bucket, 0) + 1
+
+    def GetBuckets(self, field):
+        """Get the histogram of a counter
+        @param field: name of a L{solver.SolverStats} counter
+        @return: list of (low, high, count) sorted by low, the bucket holds
+                 the values where low <= value < high
+
+        """
+        buckets = list()
+        for bucket, count in sorted(self._buckets[field].iteritems()):
+            if bucket:
+                buckets.append((1 << (bucket - 1), 1 << bucket, count))
+            else:
+                buckets.append((0, 1, count))
+        return buckets
+
+    def GetCount(self):
+        """Get the number of searches added
+        @return: int
+
+        """
+        return self._count
+
+    def GetMax(self, field):
+        """Get the largest value of a counter
+        @param field: name of a L{solver.SolverStats} counter
+        @return: int or float (seconds for time)
+
+        """
+        return self._maxes[field]
+
+    def GetMean(self, field):
+        """Get the average of a counter
+        @param field: name of a L{solver.SolverStats} counter
+        @return: float
+
+        """
+        return self._totals[field] / float(max(self._count, 1))
+
+    def GetTotal(self, field):
+        """Get the sum of a counter over all the searches
+        @param field: name of a L{solver.SolverStats} counter
+        @return: int or float (seconds for time)
+
+        """
+        return self._totals[field]
+
+#-----------------------------------------------------------------------------#
+
+def InitWorker(engine=solver.ENGINE_BITMASK, cache=None):
+    """Prepare a process for solving puzzles. The unit and peer tables are
+    built when the solver module is imported, this makes sure that happens
+    once per worker along with building any tables the engine needs.
+    @keyword engine: solver engine to use in this process
+    @keyword cache: path of a solution cache database to open or None
+
+    """
+    global _ENGINE, _CACHE
+    _ENGINE = engine
+    if engine == solver.ENGINE_DLX:
+        solver.DancingLinks()
+
+    if cache is not None:
+        _CACHE = solvecache.SolutionCache(cache)
+    else:
+        _CACHE = None
+
+def SolveOne(item):
+    """Solve one puzzle in a worker process
+    @param item: (index, puzzle string)
+    @return: (index, solution string or None)
+
+    """
+    idx, puzzle = item
+    result = solver.SudokuSolver(puzzle, _ENGINE, cache=_CACHE).GetSolution()
+    if result is not None:
+        result = ''.join(result)
+    return (idx, result)
+
+def MapPuzzles(func, puzzles, workers=None, chunksize=32, initargs=(),
+               ordered=True):
+    """Run a worker function over an iterable of puzzle strings on a pool
+    of worker processes. Results are streamed back as they become
+    available.
+    @param func: module level function taking (index, puzzle string)
+    @param puzzles: iterable of puzzle strings
+    @keyword workers: number of processes (None for one per cpu, 1 to run
+                      in the calling process without a pool)
+    @keyword chunksize: number of puzzles sent to a worker at a time
+    @keyword initargs: arguments for L{InitWorker}
+    @keyword ordered: yield results in the order of the input instead of in
+                      the order they are completed
+    @return: generator of the results of func
+
+    """
+    if workers == 1:
+        InitWorker(*initargs)
+        try:
+            for item in enumerate(puzzles):
+                yield func(item)
+        finally:
+            if _CACHE is not None:
+                _CACHE.Close()
+                InitWorker()
+        return
+
+    pool = multiprocessing.Pool(workers, InitWorker, initargs)
+    try:
+        if ordered:
+            results = pool.imap(func, enumerate(puzzles), chunksize)
+        else:
+            results = pool.imap_unordered(func, enumerate(puzzles), chunksize)
+        for result in results:
+            yield result
+    except:
+        # Abandoned or failed runs must not leave workers behind
+        pool.terminate()
+        raise
+    else:
+        pool.close()
+    finally:
+        pool.join()
+
+def ProfileOne(item):
+    """Solve one puzzle in a worker process collecting the search statistics.
+    The cache is not used so that every puzzle is searched.
+    @param item: (index, puzzle string)
+    @return: (index, L{solver.SolverStats})
+
+    """
+    idx, puzzle = item
+    search = solver.SudokuSolver(puzzle, _ENGINE, stats=True)
+    search.GetSolution()
+    return (idx, search.GetStats())
+
+def ProfileMany(puzzles, workers=None, chunksize=32,
+                engine=solver.ENGINE_BITMASK, ordered=True):
+    """Solve an iterable of puzzle strings on a pool of worker processes
+    and stream back the statistics of each search, add them to a
+    L{StatsHistogram} to aggregate them.
+    @param puzzles: iterable of puzzle strings
+    @keyword workers: number of processes (None for one per cpu, 1 to solve
+                      in the calling process without a pool)
+    @keyword chunksize: number of puzzles sent to a worker at a time
+    @keyword engine: solver engine to use
+    @keyword ordered: yield results in the order of the input instead of in
+                      the order they are completed
+    @return: generator of (index, L{solver.SolverStats})
+
+    """
+    return MapPuzzles(ProfileOne, puzzles, workers, chunksize, (engine,),
+                      ordered)
+
+def RaceSolve(puzzle, workers=None, engine=solver.ENGINE_BITMASK,
+              parts=None):
+    """Solve one hard puzzle on a pool of worker processes. The top of the
+    search tree is split into parts (see L{solver.SudokuSolver.SplitSearch})
+    that are searched at the same time, the first solution found wins and
+    the workers still searching the other parts are terminated.
+    @param puzzle: puzzle string
+    @keyword workers: number of processes (None for one per cpu)
+    @keyword engine: solver engine to search the parts with
+    @keyword parts: number of parts to split the search into or None for
+                    RACE_PARTS per worker
+    @return: solution string or None if the puzzle has no solution
+    @note: starting the pool takes around 0.1s, so racing only pays off for
+           searches that take longer than that in one process. The race
+           mode of scripts/benchmark.py measures it.
+
+    """
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    if parts is None:
+        parts = workers * RACE_PARTS
+
+    split = solver.SudokuSolver(puzzle, engine).SplitSearch(parts)
+    results = MapPuzzles(SolveOne, split, workers, 1, (engine,),
+                         ordered=False)
+    try:
+        for idx, solution in results:
+            if solution is not None:
+                return solution
+    finally:
+        # Stops the pool when the other parts are still running
+        results.close()
+    return None
+
+def RateOne(item):
+    """Rate one puzzle in a worker process
+    @param item: (index, puzzle string)
+    @return: (index, (level, steps, nodes))
+
+    """
+    idx, puzzle = item
+    return (idx, strategy.RatePuzzle(puzzle))
+
+def RateMany(puzzles, workers=None, chunksize=32, ordered=True):
+    """Rate the difficulty of an iterable of puzzle strings on a pool of
+    worker processes (see L{strategy.RatePuzzle}).
+    @param puzzles: iterable of puzzle strings
+    @keyword workers: number of processes (None for one per cpu, 1 to rate
+                      in the calling process without a pool)
+    @keyword chunksize: number of puzzles sent to a worker at a time
+    @keyword ordered: yield results in the order of the input instead of in
+                      the order they are completed
+    @return: generator of (index, (level, steps, nodes))
+
+    """
+    return MapPuzzles(RateOne, puzzles, workers, chunksize, (), ordered)
+
+def SolveMany(puzzles, workers=None, chunksize=32,
+              engine=solver.ENGINE_BITMASK, ordered=True, cache=None):
+    """Solve an iterable of puzzle strings on a pool of worker processes.
+    Results are streamed back as they become available.
+    @param puzzles: iterable of puzzle strings
+    @keyword workers: number of processes (None for one per cpu, 1 to solve
+                      in the calling process without a pool)
+    @keyword chunksize: number of puzzles sent to a worker at a time
+    @keyword engine: solver engine to use
+    @keyword ordered: yield results in the order of the input instead of in
+                      the order they are completed
+    @keyword cache: path of a solution cache database that each worker
+                    checks before solving and stores its results in
+    @return: generator of (index, solution string or None)
+
+    """
+    return MapPuzzles(SolveOne, puzzles, workers, chunksize, (engine, cache),
+                      ordered)
@@ -0,0 +1,222 @@
+###############################################################################
+# Name: canon.py                                                              #
+# Purpose: Canonical forms of puzzles for dedupe and cache keys               #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2008 Cody Precord <staff@editra.org>                         #
+# License: wxWindows License                                                  #
+###############################################################################
+
+"""
+Canonical forms of puzzles. Puzzles that are the same up to a symmetry of
+the grid have the same canonical form, so it can be used as a key for
+caching solutions and for finding duplicate puzzles.
+
+The canonical form is the minimal lexicographic (minlex) form, the smallest
+string, with empty cells counting as less than any digit, over the whole
+symmetry group: band and stack permutations, row and column permutations
+within them, transposition and digit relabeling. That is about 3.3 billion
+transforms, so instead of trying them all the form is built one row at a
+time keeping only the partial transforms that give the smallest rows so far.
+
+A transform is a tuple (cells, digits) where cells[i] is the index of the
+cell of the original puzzle that ends up at index i of the canonical form
+and digits maps each original digit to its canonical digit.
+
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__revision__ = "$Revision$"
+__scid__ = "$Id$"
+
+#-----------------------------------------------------------------------------#
+# Imports
+import itertools
+
+#-----------------------------------------------------------------------------#
+# Globals
+
+DIGITS = '123456789'
+IDENTITY = tuple(range(81))
+
+# Orders of the three bands, stacks or lines within a band or stack
+ORDERS = tuple(itertools.permutations(range(3)))
+
+#-----------------------------------------------------------------------------#
+
+def ApplyTransform(grid, transform):
+    """Put a grid in the form given by a transform
+    @param grid: 81 character puzzle or solution string
+    @param transform: (cells, digits)
+    @return: string
+
+    """
+    cells, digits = transform
+    return ''.join([digits.get(grid[cell], '.') for cell in cells])
+
+def Canonicalize(puzzle):
+    """Get the minlex form of a puzzle
+    @param puzzle: 81 character puzzle string
+    @return: (canonical string, transform)
+
+    """
+    grid = [0] * 81
+    for cell, char in enumerate(puzzle[:81]):
+        if char in DIGITS:
+            grid[cell] = int(char)
+    grids = (tuple([tuple(grid[row * 9:row * 9 + 9]) for row in range(9)]),
+             tuple([tuple(grid[col::9]) for col in range(9)]))
+
+    # Partial transforms are (transposed, rows, cols, labels, count) where
+    # labels maps the original digits to the canonical ones used so far.
+    best = None
+    for transposed, lines in enumerate(grids):
+        for row, line in enumerate(lines):
+            key, orders = FirstRowOrders(line)
+            if best is None or key > best:
+                best = key
+                partial = list()
+            if key == best:
+                for cols in orders:
+                    labels, count = LabelRow(line, cols, [0] * 10, 0)[1:]
+                    partial.append((transposed, (row,), cols, labels, count))
+
+    # Fill in the rest of the rows keeping the smallest partial forms
+    for pos in range(1, 9):
+        best = None
+        extended = list()
+        for transposed, rows, cols, labels, count in partial:
+            lines = grids[transposed]
+            for row in NextRows(rows, pos):
+                key, nlabels, ncount = LabelRow(lines[row], cols, labels, count)
+                if best is None or key < best:
+                    best = key
+                    extended = list()
+                if key == best:
+                    extended.append((transposed, rows + (row,), cols,
+                                     nlabels, ncount))
+        partial = extended
+
+    transposed, rows, cols, labels = partial[0][:4]
+    if transposed:
+        cells = tuple([col * 9 + row for row in rows for col in cols])
+    else:
+        cells = tuple([row * 9 + col for row in rows for col in cols])
+    digits = dict([(str(digit), str(labels[digit]))
+                   for digit in range(1, 10) if labels[digit]])
+    CompleteDigits(digits)
+    transform = (cells, digits)
+    return ApplyTransform(puzzle, transform), transform
+
+def CompleteDigits(digits):
+    """Extend a partial digit relabeling to all nine digits, pairing off the
+    unused digits in order.
+    @param digits: dict of original digit => canonical digit
+
+    """
+    unused = [digit for digit in DIGITS if digit not in digits]
+    free = [digit for digit in DIGITS if digit not in digits.values()]
+    digits.update(zip(unused, free))
+
+def Dedupe(puzzles):
+    """Remove the puzzles that are equivalent to an earlier one
+    @param puzzles: iterable of puzzle strings
+    @return: list of the first puzzle of each canonical form
+
+    """
+    seen = set()
+    unique = list()
+    for puzzle in puzzles:
+        key = Canonicalize(puzzle)[0]
+        if key not in seen:
+            seen.add(key)
+            unique.append(puzzle)
+    return unique
+
+def FirstRowOrders(line):
+    """Find the column orders that make a line as small as possible when it
+    is the first row. With fresh digit labels only the positions of the
+    empty cells matter, so the best orders put the stacks with the most
+    empty cells first and the empty cells first within each stack.
+    @param line: tuple of 9 digits (0 for empty)
+    @return: (sort key, list of column order tuples), larger keys are
+             smaller rows
+
+    """
+    empty = [[col for col in range(stack * 3, stack * 3 + 3)
+              if not line[col]] for stack in range(3)]
+    full = [[col for col in range(stack * 3, stack * 3 + 3)
+             if line[col]] for stack in range(3)]
+    counts = [len(cols) for cols in empty]
+    key = tuple(sorted(counts, reverse=True))
+    inner = [[perm + rest for perm in itertools.permutations(empty[stack])
+              for rest in itertools.permutations(full[stack])]
+             for stack in range(3)]
+
+    orders = list()
+    for stacks in ORDERS:
+        if tuple([counts[stack] for stack in stacks]) != key:
+            continue
+        for first, second, third in itertools.product(
+                *[inner[stack] for stack in stacks]):
+            orders.append(first + second + third)
+    return key, orders
+
+def LabelRow(line, cols, labels, count):
+    """Relabel the digits of a line in a given column order, giving digits
+    that have not been seen yet the next free labels.
+    @param line: tuple of 9 digits (0 for empty)
+    @param cols: column order
+    @param labels: list of original digit => label (0 if not seen yet)
+    @param count: number of labels used so far
+    @return: (tuple of labels, new labels, new count)
+
+    """
+    key = list()
+    copied = False
+    for col in cols:
+        digit = line[col]
+        if digit:
+            label = labels[digit]
+            if not label:
+                # Shared by the other partial forms, copy before changing
+                if not copied:
+                    labels = list(labels)
+                    copied = True
+                count += 1
+                labels[digit] = label = count
+            key.append(label)
+        else:
+            key.append(0)
+    return tuple(key), labels, count
+
+def NextRows(rows, pos):
+    """Get the rows that can be put at a position of the canonical form
+    given the rows placed before it. Rows stay within their band, so the
+    first row of a band can come from any band not used yet and the others
+    from the rest of the current band.
+    @param rows: tuple of the rows placed so far
+    @param pos: position being filled
+    @return: list of rows
+
+    """
+    if pos % 3:
+        band = rows[pos - pos % 3] // 3
+        return [row for row in range(band * 3, band * 3 + 3)
+                if row not in rows]
+
+    used = [row // 3 for row in rows]
+    return [row for row in range(9) if row // 3 not in used]
+
+def RestoreGrid(grid, transform):
+    """Put a grid in canonical form back in the form of the original puzzle
+    @param grid: 81 character string in canonical form
+    @param transform: transform returned by L{Canonicalize}
+    @return: string
+
+    """
+    cells, digits = transform
+    inverse = dict((val, key) for key, val in digits.iteritems())
+    restored = ['.'] * 81
+    for idx, cell in enumerate(cells):
+        restored[cell] = inverse.get(grid[idx], '.')
+    return ''.join(restored)
@@ -18,10 +18,14 @@ __scid__ = "$Id$"
 #-----------------------------------------------------------------------------#
 # Imports
 import os
+import array
+import binascii
 import random
 
 # Local Imports
 from puzzledb import PUZZLES
+import solver
+import strategy
 
 #-----------------------------------------------------------------------------#
 # Globals
@@ -35,6 +39,35 @@ DIFFICULTIES = { 'Easy' : DIFFICULTY_EASY,
                  'Hard' : DIFFICULTY_HARD,
                  'Evil' : DIFFICULTY_EVIL }
 
+# Sidecar file of measured puzzle ratings, by default the one for the built
+# in puzzles next to the puzzledb module.
+RATINGS_EXT = '.ratings'
+RATINGS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            'puzzledb' + RATINGS_EXT)
+
+# Box size => (table for bytearray.translate that turns the value buffer of
+# a board into its compact puzzle string, table for str.translate that turns
+# a puzzle string into a value buffer).
+_TRANSLATIONS = dict()
+
+# Table for bytearray.translate that turns a value buffer into given flags
+_GIVEN_FLAGS = '\x00' + '\x01' * 255
+
+# Table for bytearray.translate that turns given flags into a byte mask
+_GIVEN_MASK = '\x00' + '\xff' * 255
+
+# Box size => (table for str.translate that turns a puzzle string into one
+# hex digit per cell, table for str.translate that turns the hex digits back
+# into a puzzle string). Only boards with up to 15 digits fit in a nibble.
+_NIBBLES = dict()
+
+# Table for str.translate that turns hex digits into a bitmap string of the
+# non zero ones.
+_NIBBLE_BITS = '\x00' * 48 + '0' + '1' * 207
+
+# Default number of moves a board can undo
+HISTORY_LIMIT = 1000
+
 #-----------------------------------------------------------------------------#
 
 def DebugP(msg):
@@ -44,49 +77,231 @@ def DebugP(msg):
     """
     print msg
 
+def DecodeGivens(data, box=3):
+    """Decode a puzzle packed by L{EncodeGivens}
+    @param data: packed string
+    @keyword box: box size of the puzzle
+    @return: puzzle string
+    @raise ValueError: if the data does not fit the box size
+
+    """
+    cells = box ** 4
+    nbytes = (cells + 7) // 8
+    fromhex = GetNibbleTables(box)[1]
+    bitmap = binascii.hexlify(data[:nbytes])
+    bits = bin(int(bitmap or '0', 16))[2:].zfill(nbytes * 8)[:cells]
+    count = bits.count('1')
+    if len(data) != nbytes + (count + 1) // 2:
+        raise ValueError("Packed givens do not fit a box size of %d" % box)
+
+    clues = binascii.hexlify(data[nbytes:])[:count].translate(fromhex)
+    return bits.replace('0', '.').replace('1', '%s') % tuple(clues)
+
+def DecodeNibbles(data, box=3):
+    """Decode a puzzle packed by L{EncodeNibbles}
+    @param data: packed string
+    @keyword box: box size of the puzzle
+    @return: puzzle string
+    @raise ValueError: if the data does not fit the box size
+
+    """
+    cells = box ** 4
+    if len(data) != (cells + 1) // 2:
+        raise ValueError("Packed puzzle does not fit a box size of %d" % box)
+    return binascii.hexlify(data)[:cells].translate(GetNibbleTables(box)[1])
+
+def EncodeGivens(puzzle, box=3):
+    """Pack the given digits of a puzzle into a bitmap of the cells that
+    have a digit, one bit per cell, followed by the digits four bits each.
+    A 9x9 puzzle with 25 givens packs into 24 bytes.
+    @param puzzle: puzzle string
+    @keyword box: box size of the puzzle (3 or less)
+    @return: packed string
+    @see: L{DecodeGivens}
+
+    """
+    cells = box ** 4
+    nbytes = (cells + 7) // 8
+    text = str(puzzle[:cells]).ljust(cells, '.').translate(
+                                                    GetNibbleTables(box)[0])
+    bits = text.translate(_NIBBLE_BITS).ljust(nbytes * 8, '0')
+    clues = text.replace('0', '')
+    if len(clues) % 2:
+        clues += '0'
+    return binascii.unhexlify('%0*x' % (nbytes * 2, int(bits, 2)) + clues)
+
+def EncodeNibbles(puzzle, box=3):
+    """Pack a puzzle string into four bits per cell, a 9x9 puzzle packs
+    into 41 bytes.
+    @param puzzle: puzzle string
+    @keyword box: box size of the puzzle (3 or less)
+    @return: packed string
+    @see: L{DecodeNibbles}
+
+    """
+    cells = box ** 4
+    text = str(puzzle[:cells]).ljust(cells, '.').translate(
+                                                    GetNibbleTables(box)[0])
+    if cells % 2:
+        text += '0'
+    return binascii.unhexlify(text)
+
+def GetNibbleTables(box):
+    """Get the tables for converting between a puzzle string and one hex
+    digit per cell.
+    @param box: box size
+    @return: (to hex table, from hex table)
+    @raise ValueError: if the digits of the box size do not fit in a nibble
+
+    """
+    if box not in _NIBBLES:
+        digits = solver.GetTables(box).digits
+        if len(digits) > 15:
+            raise ValueError("Box size %d does not fit in a nibble" % box)
+
+        tohex = bytearray('0' * 256)
+        fromhex = bytearray('.' * 256)
+        for idx, digit in enumerate(digits):
+            hexdigit = '%x' % (idx + 1)
+            tohex[ord(digit)] = hexdigit
+            fromhex[ord(hexdigit)] = digit
+        _NIBBLES[box] = (str(tohex), str(fromhex))
+    return _NIBBLES[box]
+
+def GetTranslations(box):
+    """Get the tables for converting between the value buffer of a board
+    and its compact puzzle string.
+    @param box: box size
+    @return: (to string table, from string table)
+
+    """
+    if box not in _TRANSLATIONS:
+        tostr = bytearray('.' * 256)
+        fromstr = bytearray(256)
+        for idx, digit in enumerate(solver.GetTables(box).digits):
+            tostr[idx + 1] = digit
+            fromstr[ord(digit)] = idx + 1
+        _TRANSLATIONS[box] = (str(tostr), str(fromstr))
+    return _TRANSLATIONS[box]
+
+def ReadRatings(fname=RATINGS_FILE):
+    """Read a ratings sidecar file written by L{WriteRatings}
+    @keyword fname: path of the file
+    @return: dict of puzzle => (level, steps, nodes)
+    @raise IOError: if the file can not be read
+
+    """
+    ratings = dict()
+    f_handle = open(fname, 'r')
+    for line in f_handle:
+        fields = line.split()
+        if line.startswith('#') or len(fields) != 4:
+            continue
+
+        try:
+            ratings[fields[0]] = tuple([int(val) for val in fields[1:]])
+        except ValueError:
+            pass
+    f_handle.close()
+    return ratings
+
+def WriteRatings(ratings, fname=RATINGS_FILE):
+    """Write puzzle ratings out to a sidecar file, one puzzle per line
+    followed by its rating.
+    @param ratings: iterable of (puzzle, (level, steps, nodes))
+    @keyword fname: path of the file
+    @raise IOError: if the file can not be written
+
+    """
+    f_handle = open(fname, 'w')
+    f_handle.write("# puzzle level steps nodes\n")
+    for puzzle, rating in ratings:
+        f_handle.write("%s %d %d %d\n" % ((puzzle,) + tuple(rating)))
+    f_handle.close()
+
 #-----------------------------------------------------------------------------#
 
-class CellData(object):
-    """Data object to hold information about a given cell"""
-    def __init__(self, pos, size, readonly=False, val='', active=False):
-        """Create a cell data object
-        @param pos: Cell position
-        @param size: Size of cell
-        @keyword readonly: Value is read only
-        @keyword val: Value of cell
-        @keyword active: Is the cell active
+class CellView(object):
+    """Light weight view of one cell of a L{PuzzleBoard}. The cells state
+    is kept in the boards buffers, views are made when a cell is looked up
+    and can be thrown away.
+
+    """
+    __slots__ = ('_board', '_idx', 'val')
+
+    def __init__(self, board, idx):
+        """Create a view of a cell
+        @param board: L{PuzzleBoard}
+        @param idx: cell index
 
         """
         object.__init__(self)
 
         # Attributes
-        self.pos = pos              # Postion
-        self.size = size            # Cell Size
-        self.val = val              # Current Value
-        self.active = active        # Is active
-        self.readonly = readonly    # Is a fixed cell
-        self.pmarks = list()        # Pencil Marks
+        self._board = board
+        self._idx = idx
+        self.val = board.GetValue(idx)  # Current value, kept by the board
+
+    @property
+    def active(self):
+        """Is this the active cell"""
+        return self._board.GetActiveCell() == self._idx
+
+    @property
+    def conflict(self):
+        """Does the cells value clash with another cell in its row, column
+        or box.
+
+        """
+        return self._board.HasConflict(self._idx)
+
+    @property
+    def idx(self):
+        """Index of the cell on the board"""
+        return self._idx
+
+    @property
+    def pmarks(self):
+        """List of the digits pencil marked in the cell"""
+        marks = self._board.GetPencilMarks(self._idx)
+        return [digit for bit, digit in enumerate(self._board.digits)
+                if marks & (1 << bit)]
+
+    @property
+    def pos(self):
+        """Position of the cell on the canvas"""
+        return self.GetRect()[:2]
+
+    @property
+    def readonly(self):
+        """Is the cell one of the puzzles given values"""
+        return self._board.IsGiven(self._idx)
+
+    @property
+    def size(self):
+        """Size of the cell on the canvas"""
+        return self.GetRect()[2:]
 
     @property
     def x(self):
         """Cells X cordinate"""
-        return self.pos[0]
+        return self.GetRect()[0]
 
     @property
     def y(self):
         """Cells Y cordinate"""
-        return self.pos[1]
+        return self.GetRect()[1]
 
     @property
     def w(self):
         """Width of the cell"""
-        return self.size[0]
+        return self.GetRect()[2]
     width = w
 
     @property
     def h(self):
         """Height of the cell"""
-        return self.size[1]
+        return self.GetRect()[3]
     height = h
 
     def CanEdit(self):
@@ -94,148 +309,571 @@ class CellData(object):
         @return: bool
 
         """
-        return not self.readonly
+        return not self._board.IsGiven(self._idx)
 
     def GetRect(self):
         """Get the rect of the cell
-        @return: tuple
+        @return: tuple (x, y, w, h)
 
         """
-        return (self.x, self.y, self.w, self.h)
+        return self._board.GetCellRect(self._idx)
 
     def GetValue(self):
         """Get the cells value
         @return: str
 
         """
-        return self.val
+        return self._board.GetValue(self._idx)
 
     def SetValue(self, val):
-        """Set the cells value
+        """Set the cells value, read only cells are not changed
         @param val: string
 
         """
-        if not self.CanEdit():
-            return
+        self._board.SetValue(self._idx, val)
+
+#-----------------------------------------------------------------------------#
+
+class MoveHistory(object):
+    """Undo/redo log of the moves made on a board. Each move is kept as a
+    (cell, old value, new value) delta packed into one integer of an array,
+    so the log takes a few bytes per move and never more than the limit
+    number of moves. The values are the value buffer codes of the board (0
+    for empty, else the index of the digit plus one).
+
+    Consecutive moves in the same cell are coalesced into one delta until
+    L{Break} is called, so changing your mind about a digit is undone in one
+    step.
+
+    """
+    def __init__(self, limit=HISTORY_LIMIT, coalesce=True):
+        """Create an empty history
+        @keyword limit: max number of moves to keep
+        @keyword coalesce: merge consecutive moves in the same cell
+
+        """
+        object.__init__(self)
+
+        # Attributes
+        self._deltas = array.array('i')
+        self._pos = 0           # Number of deltas that can be undone
+        self._limit = max(0, limit)
+        self._coalesce = coalesce
+        self._open = False      # Can the next move merge with the last
+
+    def __len__(self):
+        return self._pos
+
+    @staticmethod
+    def __Unpack(delta):
+        """Split a packed delta
+        @param delta: int
+        @return: (cell, old, new)
+
+        """
+        return (delta >> 16, (delta >> 8) & 0xff, delta & 0xff)
+
+    def Break(self):
+        """Stop the next move from being merged with the last one"""
+        self._open = False
 
-        if val.isdigit():
-            self.val = val
+    def CanRedo(self):
+        """Are there undone moves that can be redone
+        @return: bool
+
+        """
+        return self._pos < len(self._deltas)
+
+    def CanUndo(self):
+        """Are there moves that can be undone
+        @return: bool
+
+        """
+        return self._pos > 0
+
+    def Clear(self):
+        """Forget all the moves"""
+        del self._deltas[:]
+        self._pos = 0
+        self._open = False
+
+    def Copy(self):
+        """Make a copy of the history
+        @return: L{MoveHistory}
+
+        """
+        history = MoveHistory(self._limit, self._coalesce)
+        history._deltas.extend(self._deltas)
+        history._pos = self._pos
+        history._open = self._open
+        return history
+
+    def GetLimit(self):
+        """Get the max number of moves that are kept
+        @return: int
+
+        """
+        return self._limit
+
+    def IsCoalescing(self):
+        """Are consecutive moves in the same cell merged
+        @return: bool
+
+        """
+        return self._coalesce
+
+    def Record(self, cell, old, new):
+        """Record a move, the moves that were undone are dropped
+        @param cell: cell index
+        @param old: value code before the move
+        @param new: value code after the move
+
+        """
+        deltas = self._deltas
+        del deltas[self._pos:]
+        if self._coalesce and self._open and deltas and \
+           deltas[-1] >> 16 == cell:
+            old = (deltas[-1] >> 8) & 0xff
+            deltas.pop()
+        if old != new:
+            deltas.append((cell << 16) | (old << 8) | new)
+            self._open = True
         else:
-            self.val = ''
+            # The merged moves put the cell back the way it was
+            self._open = False
+
+        if len(deltas) > self._limit:
+            del deltas[:len(deltas) - self._limit]
+        self._pos = len(deltas)
+
+    def Redo(self):
+        """Step forward over the last undone move
+        @return: (cell, old, new) or None if there is nothing to redo
+
+        """
+        if not self.CanRedo():
+            return None
+        self._open = False
+        self._pos += 1
+        return self.__Unpack(self._deltas[self._pos - 1])
+
+    def SetCoalesce(self, coalesce):
+        """Set if consecutive moves in the same cell are merged
+        @param coalesce: bool
+
+        """
+        self._coalesce = coalesce
+        self._open = False
+
+    def SetLimit(self, limit):
+        """Set the max number of moves to keep, the oldest moves are dropped
+        if there are more.
+        @param limit: int
+
+        """
+        self._limit = max(0, limit)
+        extra = len(self._deltas) - self._limit
+        if extra > 0:
+            del self._deltas[:extra]
+            self._pos = max(0, self._pos - extra)
+
+    def Undo(self):
+        """Step back over the last move
+        @return: (cell, old, new) or None if there is nothing to undo
+
+        """
+        if not self.CanUndo():
+            return None
+        self._open = False
+        self._pos -= 1
+        return self.__Unpack(self._deltas[self._pos])
 
 #-----------------------------------------------------------------------------#
 
-class PuzzleBoard(list):
-    """Data storage and representation of the puzzles state
-    @todo: add undo/redo support
+class PuzzleBoard(object):
+    """Data storage and representation of the puzzles state. The board is
+    box * box cells wide, the standard 9x9 board has a box size of 3.
+
+    The state is kept in flat buffers, one byte per cell for the value (0
+    for empty, else the index of the digit plus one) and for the given
+    flags and an array of pencil mark bitmasks. Copying, hashing and packing
+    a board are buffer copies. Indexing or iterating the board gives
+    L{CellView}s for drawing, one view per cell is made the first time it
+    is needed and kept. The board keeps the val attribute of its views up
+    to date, it must not be set directly.
+
+    Each row, column and box also keeps a count of how many times every
+    digit is in it, updated as the values change, so checking the board for
+    duplicates or completion does not need to scan it.
+
+    Moves are recorded in a L{MoveHistory} that L{Undo} and L{Redo} step
+    through.
 
     """
-    CORNERS = [0, 3, 6, 27, 30, 33, 54, 57, 60]
+    __slots__ = ('box', 'size', 'digits', '_tables', '_values', '_givens',
+                 '_marks', '_active', '_rects', '_counts', '_filled',
+                 '_clashes', '_history', '_labels', '_views', '_unitviews')
 
-    def __init__(self):
-        list.__init__(self)
+    def __init__(self, box=3, state=None):
+        """Create an empty board
+        @keyword box: box size (see L{solver.BOX_SIZES})
+        @keyword state: puzzle string to fill in the givens from or None
+
+        """
+        object.__init__(self)
+
+        tables = solver.GetTables(box)
+
+        # Attributes
+        self.box = box
+        self.size = box * box
+        self.digits = tables.digits
+        self._tables = tables
+        self._values = bytearray(tables.cells)     # Cell values
+        self._givens = bytearray(tables.cells)     # 1 for a given cell
+        if tables.size <= 16:
+            self._marks = array.array('H', [0] * tables.cells)
+        else:
+            self._marks = array.array('I', [0] * tables.cells)
+        self._active = None     # Index of the active cell
+        self._rects = None      # Canvas rects of the cells
+        # Unit index * (size + 1) + value => count of the value in the unit
+        self._counts = bytearray(len(tables.units) * (tables.size + 1))
+        self._filled = 0        # Number of cells with a value
+        self._clashes = set()   # (unit index, value) that are in a unit twice
+        self._history = MoveHistory()
+        self._labels = ('',) + tuple(tables.digits)  # Value => value string
+        self._views = None      # CellView of each cell
+        self._unitviews = None  # CellViews of each unit
+
+        if state is not None:
+            self.SetState(state)
+
+    def __copy__(self):
+        return self.Copy()
+
+    def __eq__(self, other):
+        """Boards are equal when they have the same values and givens"""
+        if not isinstance(other, PuzzleBoard):
+            return NotImplemented
+        return self.box == other.box and self._values == other._values and \
+               self._givens == other._givens
+
+    def __getitem__(self, idx):
+        """Get a view of a cell or a list of views for a slice"""
+        return self.__GetViews()[idx]
+
+    def __getstate__(self):
+        return self.Pack()
+
+    def __hash__(self):
+        """Hash of the values and givens, do not change a board while it is
+        used as a key.
+
+        """
+        return hash((self.box, str(self._values), str(self._givens)))
+
+    def __iter__(self):
+        return iter(self.__GetViews())
+
+    def __len__(self):
+        return len(self._values)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    def __setstate__(self, data):
+        board = PuzzleBoard.Unpack(data)
+        for attr in PuzzleBoard.__slots__:
+            setattr(self, attr, getattr(board, attr))
 
     def __str__(self):
         """Convert the board to a string in compact puzzle format"""
-        rstr = ''
-        for cell in self:
-            if cell.val.isdigit():
-                rstr += cell.val
-            else:
-                rstr += '.'
-        return rstr
+        return str(self._values.translate(GetTranslations(self.box)[0]))
 
-    def append(self, cell):
-        """Add a cell to the board
-        @param cell: L{CellData}
-        @note: overrides list.append
+    def __GetUnitViews(self):
+        """Get the views of the cells of every unit
+        @return: tuple of tuples of L{CellView} in the order of the units
 
         """
-        if isinstance(cell, CellData):
-            list.append(self, cell)
-        else:
-            raise TypeError, "A PuzzleBoard can only accept CellData"
+        if self._unitviews is None:
+            views = self.__GetViews()
+            self._unitviews = tuple(tuple([views[cell] for cell in unit])
+                                    for unit in self._tables.units)
+        return self._unitviews
+
+    def __GetViews(self):
+        """Get the views of all the cells
+        @return: list of L{CellView}
+
+        """
+        if self._views is None:
+            self._views = [CellView(self, idx)
+                           for idx in xrange(len(self._values))]
+        return self._views
+
+    def __CountValues(self):
+        """Recount the digits of every unit from the value buffer"""
+        values, stride = self._values, self.size + 1
+        counts = bytearray(len(self._counts))
+        for uidx, unit in enumerate(self._tables.units):
+            base = uidx * stride
+            for cell in unit:
+                if values[cell]:
+                    counts[base + values[cell]] += 1
+
+        self._counts = counts
+        self._filled = len(self._values) - self._values.count('\x00')
+        self._clashes = set()
+        for uidx in xrange(len(self._tables.units)):
+            base = uidx * stride
+            for val in xrange(1, stride):
+                if counts[base + val] > 1:
+                    self._clashes.add((uidx, val))
+
+        if self._views is not None:
+            labels = self._labels
+            for view in self._views:
+                view.val = labels[values[view.idx]]
+
+    def __GetUnitValues(self, unit):
+        """Get the values of a row, column or block
+        @param unit: tuple of cell indexes
+        @return: list of digits, '0' for an empty cell
+
+        """
+        values, digits = self._values, self.digits
+        return [values[cell] and digits[values[cell] - 1] or '0'
+                for cell in unit]
+
+    def __SetCode(self, cell, new):
+        """Change the value code of a cell and update the digit counts
+        @param cell: int
+        @param new: value code (0 for empty)
+
+        """
+        old = self._values[cell]
+        self._values[cell] = new
+        if self._views is not None:
+            self._views[cell].val = self._labels[new]
+        counts, stride = self._counts, self.size + 1
+        units = self._tables.cellunits[cell]
+        if old:
+            self._filled -= 1
+            for uidx in units:
+                idx = uidx * stride + old
+                counts[idx] -= 1
+                if counts[idx] == 1:
+                    self._clashes.discard((uidx, old))
+        if new:
+            self._filled += 1
+            for uidx in units:
+                idx = uidx * stride + new
+                counts[idx] += 1
+                if counts[idx] == 2:
+                    self._clashes.add((uidx, new))
 
     def ActivateCell(self, cell):
         """Set the active cell
-        @param cell: cell to activate
+        @param cell: cell to activate or None
         @postcondition: All cells but the specified are deactivated
 
         """
-        for idx, cell_data in enumerate(self):
-            if idx != cell:
-                cell_data.active = False
-            else:
-                cell_data.active = True
+        if cell != self._active:
+            self._history.Break()
+        self._active = cell
+
+    def Copy(self):
+        """Make a copy of the board
+        @return: L{PuzzleBoard}
+
+        """
+        board = PuzzleBoard.__new__(PuzzleBoard)
+        board.box = self.box
+        board.size = self.size
+        board.digits = self.digits
+        board._tables = self._tables
+        board._values = bytearray(self._values)
+        board._givens = bytearray(self._givens)
+        board._marks = array.array(self._marks.typecode, self._marks)
+        board._active = self._active
+        board._rects = self._rects
+        board._counts = bytearray(self._counts)
+        board._filled = self._filled
+        board._clashes = set(self._clashes)
+        board._history = self._history.Copy()
+        board._labels = self._labels
+        board._views = None
+        board._unitviews = None
+        return board
+
+    def GetActiveCell(self):
+        """Get the index of the active cell
+        @return: int or None
+
+        """
+        return self._active
+
+    def GetBlockCells(self, block):
+        """Get the indexes of the cells in a block (0-8 on a 9x9 board)
+        @param block: int
+        @return: tuple shared by all boards of this size, do not modify
+
+        """
+        return self._tables.boxes[block]
 
     def GetBlockValues(self, block):
-        """Get the list of values for the given block (0-8)
+        """Get the list of values for the given block (0-8 on a 9x9 board)
         @param block: int
         @return: list
+        @note: '0' represents an empty cell
+
+        """
+        return self.__GetUnitValues(self._tables.boxes[block])
+
+    def GetCellRect(self, cell):
+        """Get the canvas rect of a cell
+        @param cell: int
+        @return: tuple (x, y, w, h), all 0 if the board has no rects
 
         """
-        cell = PuzzleBoard.CORNERS[block]
-        return self.GetValueList(self.GetCellsSameBlock(cell))
+        if self._rects is None:
+            return (0, 0, 0, 0)
+        return self._rects[cell]
 
     def GetCellsSameBlock(self, cell):
-        """Get all the cells that are in the same 3x3 block as the given cell
+        """Get all the cells that are in the same block as the given cell
         @param cell: int
-        @return: list
+        @return: tuple of L{CellView}, kept by the board do not modify
 
         """
-        row, column = self.GetPosition(cell)
-        block = (3 * (row / 3) + (column / 3))
-        idx = (9 * (block / 3) + (block % 3)) * 3
-        return self[idx:idx+3] + self[idx+9:idx+12] + self[idx+18:idx+21]
+        return self.__GetUnitViews()[self._tables.cellunits[cell][2]]
 
     def GetCellsSameColumn(self, cell):
-        """Get a list of the cells that are in the same column as the given
-        cell.
+        """Get the cells that are in the same column as the given cell.
         @param cell: int
+        @return: tuple of L{CellView}, kept by the board do not modify
 
         """
-        return [ self[idx] for idx in range(cell % 9, 81, 9) ]
+        return self.__GetUnitViews()[self._tables.cellunits[cell][0]]
 
     def GetCellsSameRow(self, cell):
-        """Get a list of the cells that are in the same row as the given cell.
+        """Get the cells that are in the same row as the given cell.
         @param cell: int
+        @return: tuple of L{CellView}, kept by the board do not modify
 
         """
-        start = (cell / 9) * 9
-        return self[start:start+9]
+        return self.__GetUnitViews()[self._tables.cellunits[cell][1]]
+
+    def GetColumnCells(self, column):
+        """Get the indexes of the cells in a column
+        @param column: int
+        @return: tuple shared by all boards of this size, do not modify
+
+        """
+        return self._tables.cols[column]
 
     def GetColumnValues(self, column):
         """Get the list of values for the given column
         @param column: column to get values from
         @type column: int
         @return: list
-        @note: 0 represents an empty cell
+        @note: '0' represents an empty cell
 
         """
-        return self.GetValueList(self.GetCellsSameColumn(column))
+        return self.__GetUnitValues(self._tables.cols[column])
 
-    @staticmethod
-    def GetPosition(cell):
+    def GetConflicts(self):
+        """Get the cells whose value is also in another cell of the same
+        row, column or box. Only the units that have a duplicate are looked
+        at, so this is cheap while the board has few or none.
+        @return: sorted list of cell indexes
+
+        """
+        values = self._values
+        units = self._tables.units
+        cells = set()
+        for uidx, val in self._clashes:
+            cells.update([cell for cell in units[uidx] if values[cell] == val])
+        return sorted(cells)
+
+    def GetGivens(self):
+        """Get the puzzle string of the given values of the board
+        @return: string
+
+        """
+        # Mask the values with the given flags as one big integer
+        mask = self._givens.translate(_GIVEN_MASK)
+        givens = int(binascii.hexlify(self._values), 16) & \
+                 int(binascii.hexlify(mask), 16)
+        values = binascii.unhexlify('%0*x' % (2 * len(self._values), givens))
+        return values.translate(GetTranslations(self.box)[0])
+
+    def GetHistory(self):
+        """Get the undo/redo history of the board
+        @return: L{MoveHistory}
+
+        """
+        return self._history
+
+    def GetPeerCells(self, cell):
+        """Get the indexes of the cells that share a row, column or block
+        with a cell, not including the cell itself.
+        @param cell: int
+        @return: sorted tuple shared by all boards of this size, do not modify
+
+        """
+        return self._tables.peers[cell]
+
+    def GetPencilMarks(self, cell):
+        """Get the pencil marks of a cell
+        @param cell: int
+        @return: bitmask of digit indexes
+
+        """
+        return self._marks[cell]
+
+    def GetPosition(self, cell):
         """Get the (row, column) position of a given cell
         @param cell: int
         @return: tuple
 
         """
-        return (cell / 9, cell % 9)
+        return self._tables.positions[cell]
+
+    def GetRowCells(self, row):
+        """Get the indexes of the cells in a row
+        @param row: int
+        @return: tuple shared by all boards of this size, do not modify
+
+        """
+        return self._tables.rows[row]
 
     def GetRowValues(self, row):
         """Get the list of values for the given row
         @param row: row to get values from
         @type row: int
         @return: list
+        @note: '0' represents an empty cell
 
         """
-        return self.GetValueList(self.GetCellsSameRow(row * 9))
+        return self.__GetUnitValues(self._tables.rows[row])
+
+    def GetValue(self, cell):
+        """Get the value of a cell
+        @param cell: int
+        @return: string ('' if empty)
+
+        """
+        return self._labels[self._values[cell]]
 
     @staticmethod
     def GetValueList(cells):
         """Get a list of values from the given list of cells
-        @param cells: list of L{CellData}
+        @param cells: list of L{CellView}
         @return: list of cell values
 
         """
@@ -252,14 +890,173 @@ class PuzzleBoard(list):
         @return: bool
 
         """
-        for i in range(9):
-            rstr = ''.join(sorted(self.GetRowValues(i)))
-            cstr = ''.join(sorted(self.GetColumnValues(i)))
-            bstr = ''.join(sorted(self.GetBlockValues(i)))
-            for val in (rstr, cstr, bstr):
-                if val != "123456789":
-                    return False
-        return True
+        return self._filled == len(self._values) and not self._clashes
+
+    def HasConflict(self, cell):
+        """Is the value of a cell also in another cell of the same row,
+        column or box.
+        @param cell: int
+        @return: bool (False for an empty cell)
+
+        """
+        val = self._values[cell]
+        if not val:
+            return False
+        counts, stride = self._counts, self.size + 1
+        for uidx in self._tables.cellunits[cell]:
+            if counts[uidx * stride + val] > 1:
+                return True
+        return False
+
+    def IsGiven(self, cell):
+        """Is a cell one of the puzzles given values
+        @param cell: int
+        @return: bool
+
+        """
+        return bool(self._givens[cell])
+
+    def Pack(self):
+        """Serialize the values, givens and pencil marks of the board
+        @return: string
+        @see: L{Unpack}
+
+        """
+        return chr(self.box) + str(self._values) + str(self._givens) + \
+               self._marks.tostring()
+
+    def PackGivens(self):
+        """Pack the given values of the board with L{EncodeGivens}
+        @return: string
+        @see: L{UnpackGivens}
+
+        """
+        return EncodeGivens(self.GetGivens(), self.box)
+
+    def PackNibbles(self):
+        """Pack the values of the board with L{EncodeNibbles}, the packed
+        string is a compact key of the boards current state.
+        @return: string
+        @see: L{UnpackNibbles}
+
+        """
+        return EncodeNibbles(str(self), self.box)
+
+    def Redo(self):
+        """Redo the last undone move
+        @return: index of the changed cell or None if there was nothing to
+                 redo
+
+        """
+        delta = self._history.Redo()
+        if delta is None:
+            return None
+        self.__SetCode(delta[0], delta[2])
+        return delta[0]
+
+    def SetCellRects(self, rects):
+        """Set the canvas rects of the cells
+        @param rects: sequence of (x, y, w, h) in cell order, it is shared
+                      and not copied
+
+        """
+        self._rects = rects
+
+    def SetPencilMarks(self, cell, marks):
+        """Set the pencil marks of a cell
+        @param cell: int
+        @param marks: bitmask of digit indexes
+
+        """
+        self._marks[cell] = marks
+
+    def SetState(self, state):
+        """Fill the board from a puzzle string, the digits in it become the
+        read only givens and all other cells are emptied.
+        @param state: puzzle string
+
+        """
+        cells = len(self._values)
+        state = str(state[:cells]).ljust(cells, '.')
+        self._values[:] = state.translate(GetTranslations(self.box)[1])
+        self._givens[:] = self._values.translate(_GIVEN_FLAGS)
+        for idx in xrange(cells):
+            self._marks[idx] = 0
+        self.__CountValues()
+        self._history.Clear()
+
+    def SetValue(self, cell, val, record=True):
+        """Set the value of a cell, values that are not a single digit of
+        the board empty the cell. Read only given cells are not changed.
+        @param cell: int
+        @param val: string
+        @keyword record: record the change in the undo history
+
+        """
+        if self._givens[cell]:
+            return
+
+        if len(val) == 1:
+            new = self.digits.find(val) + 1
+        else:
+            new = 0
+
+        old = self._values[cell]
+        if new == old:
+            return
+
+        if record:
+            self._history.Record(cell, old, new)
+        self.__SetCode(cell, new)
+
+    def Undo(self):
+        """Undo the last move
+        @return: index of the changed cell or None if there was nothing to
+                 undo
+
+        """
+        delta = self._history.Undo()
+        if delta is None:
+            return None
+        self.__SetCode(delta[0], delta[1])
+        return delta[0]
+
+    @staticmethod
+    def Unpack(data):
+        """Create a board from the data of L{Pack}
+        @param data: string
+        @return: L{PuzzleBoard}
+
+        """
+        board = PuzzleBoard(ord(data[0]))
+        cells = len(board._values)
+        board._values[:] = bytearray(data[1:cells + 1])
+        board._givens[:] = bytearray(data[cells + 1:2 * cells + 1])
+        del board._marks[:]
+        board._marks.fromstring(data[2 * cells + 1:])
+        board.__CountValues()
+        return board
+
+    @staticmethod
+    def UnpackGivens(data, box=3):
+        """Create a board from the data of L{PackGivens}
+        @param data: string
+        @keyword box: box size
+        @return: L{PuzzleBoard}
+
+        """
+        return PuzzleBoard(box, DecodeGivens(data, box))
+
+    @staticmethod
+    def UnpackNibbles(data, box=3):
+        """Create a board from the data of L{PackNibbles}, all its values
+        become givens.
+        @param data: string
+        @keyword box: box size
+        @return: L{PuzzleBoard}
+
+        """
+        return PuzzleBoard(box, DecodeNibbles(data, box))
 
 #-----------------------------------------------------------------------------#
 
@@ -273,10 +1070,38 @@ class PuzzleManager(object):
 
         # Attributes
         self._boards = dict()
+        self._rejected = list()     # Puzzles that failed validation
+        self._ratings = dict()      # Measured ratings of the puzzles
 
         # Setup
         self.LoadPuzzles()
 
+    def BucketByRating(self, fname=RATINGS_FILE):
+        """Regroup the loaded puzzles by the difficulty measured by the
+        strategy rater instead of the hand assigned one. Puzzles that are
+        not in the ratings file stay where they are.
+        @keyword fname: path of the ratings sidecar file
+        @return: bool
+
+        """
+        try:
+            self._ratings = ReadRatings(fname)
+        except IOError, msg:
+            DebugP("[puzzle][err] %s" % msg)
+            return False
+
+        boards = dict()
+        for diff, puzzles in self._boards.iteritems():
+            for puzzle in puzzles:
+                rating = self._ratings.get(puzzle, None)
+                if rating is not None:
+                    bucket = strategy.GetDifficulty(rating)
+                else:
+                    bucket = diff
+                boards.setdefault(bucket, list()).append(puzzle)
+        self._boards = boards
+        return True
+
     def GetNewPuzzle(self, diff=DIFFICULTY_NORMAL):
         """Get a new random game board
         @keyword diff: Puzzle difficulty rating
@@ -293,6 +1118,20 @@ class PuzzleManager(object):
                 board = puzzles[puzzleid]
         return (puzzleid, board)
 
+    def GetPackedPuzzles(self, difficulty, givens=False):
+        """Get the puzzles of a difficulty packed with L{EncodeNibbles} or
+        L{EncodeGivens}
+        @param difficulty: int
+        @keyword givens: use the givens bitmap encoding
+        @return: list of strings
+
+        """
+        if givens:
+            encode = EncodeGivens
+        else:
+            encode = EncodeNibbles
+        return [encode(puzzle) for puzzle in self.GetPuzzles(difficulty)]
+
     def GetPuzzleData(self):
         """Get the dictionary of all loaded puzzles
         @return: dict
@@ -300,6 +1139,22 @@ class PuzzleManager(object):
         """
         return self._boards
 
+    def GetRating(self, puzzle):
+        """Get the measured rating of a puzzle loaded by L{BucketByRating}
+        @param puzzle: puzzle string
+        @return: (level, steps, nodes) or None
+
+        """
+        return self._ratings.get(puzzle, None)
+
+    def GetRejectedPuzzles(self):
+        """Get the puzzles that were not loaded by the last call to
+        L{LoadPuzzles} because they did not have exactly one solution.
+        @return: list
+
+        """
+        return self._rejected
+
     def GetPuzzles(self, difficulty):
         """Get the list of puzzles for the given difficulty
         @param difficulty: int
@@ -308,7 +1163,7 @@ class PuzzleManager(object):
         """
         return self._boards.get(difficulty, [])
 
-    def LoadPuzzles(self, fname=None):
+    def LoadPuzzles(self, fname=None, validate=False):
         """Load the game boards from a puzzle data file. The data file must
         contain puzzles that are in the standard compact form, with one puzzle
         per line. Puzzle difficultys can be specified by a line starting with
@@ -317,11 +1172,13 @@ class PuzzleManager(object):
         The valid difficulties are (Easy, Normal, Hard, Evil)
 
         @keyword fname: path to file to load, or None for default
+        @keyword validate: only load puzzles that have exactly one solution
         @return: boolean
 
         """
         puzzles = dict()
         current = None
+        self._rejected = list()
         if fname is None:
             puzzles = PUZZLES
         else:
@@ -335,7 +1192,12 @@ class PuzzleManager(object):
                         if current is not None and not puzzles.has_key(current):
                             puzzles[current] = list()
                     elif current is not None and len(line) == 81:
-                        puzzles[current].append(line)
+                        if not validate or \
+                           solver.SudokuSolver(line,
+                                               solver.ENGINE_BITMASK).IsUnique():
+                            puzzles[current].append(line)
+                        else:
+                            self._rejected.append(line)
                     else:
                         pass
                 f_handle.close()
@@ -348,5 +1210,22 @@ class PuzzleManager(object):
         self._boards = puzzles
         return True
 
+    def SetPackedPuzzles(self, difficulty, packed, givens=False):
+        """Set the puzzles of a difficulty from a list made by
+        L{GetPackedPuzzles}
+        @param difficulty: int
+        @param packed: list of strings
+        @keyword givens: the puzzles use the givens bitmap encoding
+        @raise ValueError: if a packed puzzle is not valid
+
+        """
+        if givens:
+            decode = DecodeGivens
+        else:
+            decode = DecodeNibbles
+        boards = dict(self._boards)
+        boards[difficulty] = [decode(data) for data in packed]
+        self._boards = boards
+
 # Create a PuzzleManager instance to use as a singleton
 ThePuzzleManager = PuzzleManager()
@@ -0,0 +1,250 @@
+###############################################################################
+# Name: solvecache.py                                                         #
+# Purpose: Persistent on disk cache of puzzle solutions                       #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2008 Cody Precord <staff@editra.org>                         #
+# License: wxWindows License                                                  #
+###############################################################################
+
+"""
+Persistent cache of puzzle solutions stored in an SQLite database. Puzzles
+are stored by their canonical form (see L{canon}) so that a puzzle that was
+solved once is a cache hit in any of its equivalent forms. Finding the
+canonical form takes longer than solving most puzzles, so each puzzle is
+also stored as it was given and looked up that way first.
+
+Marking the puzzles that are looked up as recently used is batched, the
+marks are written out every TOUCH_BATCH hits, on L{Put} and on L{Flush}.
+
+The cache holds at most a fixed number of puzzles, when it grows past that
+the least recently used ones are evicted.
+
+Puzzles with fewer than MIN_CLUES givens are not cached. Finding the
+canonical form of a sparse grid takes far longer than solving it, and with
+fewer than 17 givens a puzzle can not have a unique solution anyway.
+
+@note: a connection can only be used by the thread that opened it, open one
+       cache per thread or process.
+
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__revision__ = "$Revision$"
+__scid__ = "$Id$"
+
+#-----------------------------------------------------------------------------#
+# Imports
+import sqlite3
+
+# Local Imports
+import canon
+
+#-----------------------------------------------------------------------------#
+# Globals
+
+CACHE_FILE = 'solutions.db'
+DEFAULT_SIZE = 100000   # Max number of puzzles kept in the cache
+
+# Number of cache hits to collect before writing their use marks
+TOUCH_BATCH = 256
+
+# Puzzles with fewer givens than this are passed over by the cache
+MIN_CLUES = 17
+
+# Stored in place of a solution for puzzles that have none
+NO_SOLUTION = ''
+
+# Raised when the database can not be opened or used
+CacheError = sqlite3.Error
+
+#-----------------------------------------------------------------------------#
+
+class SolutionCache(object):
+    """Size bounded on disk store of puzzle solutions"""
+    def __init__(self, path, maxsize=DEFAULT_SIZE):
+        """Open or create the cache database
+        @param path: path of the database file
+        @keyword maxsize: max number of puzzles to keep
+
+        """
+        object.__init__(self)
+
+        # Attributes
+        self._maxsize = maxsize
+        self._hits = 0
+        self._misses = 0
+        self._touched = dict()  # Key => use clock of hits not written yet
+        self._lastkey = None    # (puzzle, key, transform) of the last miss
+        self._db = sqlite3.connect(path, timeout=30)
+
+        # Commit every write without waiting on the disk, so that batch
+        # workers sharing the database only hold its lock briefly.
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS solutions "
+                         "(puzzle TEXT PRIMARY KEY, solution TEXT, "
+                         "used INTEGER)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS solutions_used "
+                         "ON solutions (used)")
+        self._db.commit()
+        self._size, self._clock = self._db.execute("SELECT COUNT(*), "
+                                                   "MAX(used) FROM "
+                                                   "solutions").fetchone()
+        self._clock = self._clock or 0
+
+    def __Evict(self):
+        """Remove the least recently used tenth of the cache when it is
+        over its size limit.
+
+        """
+        if self._size <= self._maxsize:
+            return
+
+        keep = self._maxsize - self._maxsize // 10
+        self._db.execute("DELETE FROM solutions WHERE puzzle IN (SELECT "
+                         "puzzle FROM solutions ORDER BY used LIMIT ?)",
+                         (self._size - keep,))
+        self._size = self._db.execute("SELECT COUNT(*) FROM "
+                                      "solutions").fetchone()[0]
+
+    def __Lookup(self, key):
+        """Look up the stored solution of a key and mark it as used
+        @param key: puzzle string
+        @return: solution string or None if the key is not stored
+
+        """
+        row = self._db.execute("SELECT solution FROM solutions WHERE "
+                               "puzzle = ?", (key,)).fetchone()
+        if row is None:
+            return None
+
+        self._touched[key] = self.__Touch()
+        if len(self._touched) >= TOUCH_BATCH:
+            self.Flush()
+        return str(row[0])
+
+    def __Store(self, key, solution, used):
+        """Store the solution of a key without committing
+        @param key: puzzle string
+        @param solution: solution string
+        @param used: use clock
+
+        """
+        cursor = self._db.execute("INSERT OR IGNORE INTO solutions "
+                                  "VALUES (?, ?, ?)", (key, solution, used))
+        if cursor.rowcount:
+            self._size += 1
+        else:
+            self._db.execute("UPDATE solutions SET solution = ?, used = ? "
+                             "WHERE puzzle = ?", (solution, used, key))
+
+    def __Touch(self):
+        """Advance the use clock
+        @return: int
+
+        """
+        self._clock += 1
+        return self._clock
+
+    def Clear(self):
+        """Remove everything from the cache"""
+        self._db.execute("DELETE FROM solutions")
+        self._db.commit()
+        self._size = 0
+        self._touched.clear()
+        self._lastkey = None
+
+    def Close(self):
+        """Write any pending use marks and close the database"""
+        self.Flush()
+        self._db.close()
+
+    def Flush(self):
+        """Write the use marks of the cache hits that are still pending"""
+        if self._touched:
+            self._db.executemany("UPDATE solutions SET used = ? WHERE "
+                                 "puzzle = ?", [(used, key) for key, used
+                                                in self._touched.iteritems()])
+            self._db.commit()
+            self._touched.clear()
+
+    def Get(self, puzzle):
+        """Look up the solution of a puzzle
+        @param puzzle: 81 character puzzle string
+        @return: solution string, NO_SOLUTION if the puzzle is known to have
+                 no solution or None if the puzzle is not in the cache
+
+        """
+        if not self.IsCached(puzzle):
+            return None
+
+        # The puzzle as it was given
+        solution = self.__Lookup(puzzle)
+        if solution is not None:
+            self._hits += 1
+            return solution
+
+        # Any of its equivalent forms, remember the key for Put
+        key, transform = canon.Canonicalize(puzzle)
+        self._lastkey = (puzzle, key, transform)
+        solution = self.__Lookup(key)
+        if solution is None:
+            self._misses += 1
+            return None
+
+        self._hits += 1
+        if solution != NO_SOLUTION:
+            solution = canon.RestoreGrid(solution, transform)
+        self.__Store(puzzle, solution, self.__Touch())
+        self.__Evict()
+        self._db.commit()
+        return solution
+
+    def GetStats(self):
+        """Get the hit and miss counters for this connection
+        @return: dict(hits=int, misses=int, size=int)
+
+        """
+        return dict(hits=self._hits, misses=self._misses, size=self._size)
+
+    @staticmethod
+    def IsCached(puzzle):
+        """Check if a puzzle has enough givens to be kept in the cache
+        @param puzzle: 81 character puzzle string
+        @return: bool
+
+        """
+        givens = 0
+        for digit in canon.DIGITS:
+            givens += puzzle[:81].count(digit)
+        return givens >= MIN_CLUES
+
+    def Put(self, puzzle, solution):
+        """Store the solution of a puzzle, puzzles with fewer than MIN_CLUES
+        givens are not stored.
+        @param puzzle: 81 character puzzle string
+        @param solution: solution string or None if it has no solution
+
+        """
+        if not self.IsCached(puzzle):
+            return
+
+        if self._lastkey is not None and self._lastkey[0] == puzzle:
+            key, transform = self._lastkey[1:]
+        else:
+            key, transform = canon.Canonicalize(puzzle)
+        self._lastkey = None
+
+        if solution is None:
+            solution = canonical = NO_SOLUTION
+        else:
+            solution = ''.join(solution)
+            canonical = canon.ApplyTransform(solution, transform)
+
+        self.Flush()
+        used = self.__Touch()
+        self.__Store(key, canonical, used)
+        if key != puzzle:
+            self.__Store(puzzle, solution, used)
+        self.__Evict()
+        self._db.commit()
@@ -23,6 +23,12 @@ Sudoku Puzzle Solver for checking puzzle solution and providing hints
 __revision__ = "$Revision$"
 __scid__ = "$Id$"
 
+#-----------------------------------------------------------------------------#
+# Imports
+import time
+import random
+import itertools
+
 #-----------------------------------------------------------------------------#
 # Globals 
 
@@ -50,15 +56,421 @@ UNITS = dict((square, [unit for unit in UNITLIST if square in unit])
 PEERS = dict((s, set(s2 for u in UNITS[s] for s2 in u if s2 != s))
              for s in SQUARES)
 
+# Solver Engines
+ENGINE_DICT = 0     # Candidate strings in a dict keyed by square name
+ENGINE_BITMASK = 1  # Candidate bitmasks in a list keyed by cell index
+ENGINE_DLX = 2      # Exact cover of the 324 constraints with dancing links
+
+# Propagation Levels, each level also does the reasoning of the ones before
+PROPAGATE_SINGLES = 0   # Naked and hidden singles
+PROPAGATE_POINTING = 1  # Pointing pairs and box line reduction
+PROPAGATE_PAIRS = 2     # Naked and hidden pairs
+PROPAGATE_TRIPLES = 3   # Naked and hidden triples
+
+# Branching Rules
+BRANCH_MRV = 0          # Cell with the fewest candidates
+BRANCH_MRV_DEGREE = 1   # Same, ties broken by the most open peers
+BRANCH_RAREST = 2       # Places of the digit with the fewest in a unit
+
+# Value Orders
+ORDER_DIGITS = 0        # Smallest digit first
+ORDER_LCV = 1           # Least constraining value, fewest open peers first
+
+# Search Status
+STATUS_SOLVED = 0       # A solution was found
+STATUS_NO_SOLUTION = 1  # The whole search space was tried
+STATUS_GAVE_UP = 2      # The node budget or time ran out or it was cancelled
+
+#---- Bitmask Engine Tables ----#
+
+# Supported box sizes, a grid with boxes of box x box cells is box * box
+# cells wide and uses the first box * box characters of GRID_DIGITS.
+BOX_SIZES = (2, 3, 4, 5)
+GRID_DIGITS = '123456789ABCDEFGHIJKLMNOP'
+
+# Widest candidate mask that gets a full bit count lookup table
+COUNT_TABLE_BITS = 16
+
+class BitCount(object):
+    """Number of candidates in masks that are too wide for a full lookup
+    table, counted in two halves.
+
+    """
+    def __init__(self, bits):
+        """Build the half width table
+        @param bits: width of the masks
+
+        """
+        object.__init__(self)
+
+        # Attributes
+        self.shift = (bits + 1) // 2
+        self.low = (1 << self.shift) - 1
+        self.table = MakeBitCount(self.shift)
+
+    def __getitem__(self, mask):
+        return self.table[mask & self.low] + self.table[mask >> self.shift]
+
+class GridTables(object):
+    """Unit, peer and candidate tables of one grid size. Get them with
+    L{GetTables} so they are only built once per size.
+
+    """
+    def __init__(self, box):
+        """Build the tables
+        @param box: box size (2 to 5)
+
+        """
+        object.__init__(self)
+
+        size = box * box
+        cells = size * size
+
+        # Attributes
+        self.box = box          # Width of a box
+        self.size = size        # Width of the grid
+        self.cells = cells      # Number of cells
+        self.digits = GRID_DIGITS[:size]
+        self.alldigits = (1 << size) - 1
+
+        # Rows, Columns and Boxes as tuples of cell indexes
+        self.rows = tuple(tuple(range(row * size, (row + 1) * size))
+                          for row in range(size))
+        self.cols = tuple(tuple(range(col, cells, size))
+                          for col in range(size))
+        self.boxes = tuple(tuple((brow * box + row) * size + bcol * box + col
+                                 for row in range(box) for col in range(box))
+                           for brow in range(box) for bcol in range(box))
+
+        # List of all Columns, Rows, Boxes in the same order as UNITLIST
+        self.units = self.cols + self.rows + self.boxes
+
+        # Cell index => (row, column)
+        self.positions = tuple(divmod(cell, size) for cell in range(cells))
+
+        # Cell index => (indexes of the units it belongs to)
+        cellunits = [list() for cell in range(cells)]
+        for uidx, unit in enumerate(self.units):
+            for cell in unit:
+                cellunits[cell].append(uidx)
+        self.cellunits = tuple(tuple(units) for units in cellunits)
+
+        # Each box and line that cross as (box unit index, line unit index,
+        # cells in both, rest of the box, rest of the line)
+        intersections = list()
+        for bidx in range(2 * size, 3 * size):
+            bcells = self.units[bidx]
+            for lidx in range(2 * size):
+                line = self.units[lidx]
+                both = tuple(cell for cell in bcells if cell in line)
+                if both:
+                    intersections.append((bidx, lidx, both,
+                                          tuple(cell for cell in bcells
+                                                if cell not in both),
+                                          tuple(cell for cell in line
+                                                if cell not in both)))
+        self.intersections = tuple(intersections)
+
+        # Cell index => (indexes of all cells that are in same unit)
+        peers = [set() for cell in range(cells)]
+        for unit in self.units:
+            for cell in unit:
+                peers[cell].update(unit)
+        self.peers = tuple(tuple(sorted(peers[cell] - set([cell])))
+                           for cell in range(cells))
+
+        # Candidate mask => number of candidates in it
+        if size <= COUNT_TABLE_BITS:
+            self.bitcount = MakeBitCount(size)
+        else:
+            self.bitcount = BitCount(size)
+
+        # Map of digit <=> single candidate mask
+        self.digitmask = dict((digit, 1 << idx)
+                              for idx, digit in enumerate(self.digits))
+        self.maskdigit = dict((1 << idx, digit)
+                              for idx, digit in enumerate(self.digits))
+
+# Box size => L{GridTables}
+_TABLES = dict()
+
+def GetTables(box=3):
+    """Get the tables of a grid size, building them the first time
+    @keyword box: box size (2 to 5)
+    @return: L{GridTables}
+
+    """
+    if box not in _TABLES:
+        if box not in BOX_SIZES:
+            raise ValueError("Unsupported box size %s" % box)
+        _TABLES[box] = GridTables(box)
+    return _TABLES[box]
+
+def GetBoxSize(puzzle):
+    """Get the box size of a puzzle from the length of its string
+    @param puzzle: puzzle string
+    @return: box size (3 if the length does not match any grid size)
+
+    """
+    for box in BOX_SIZES:
+        if len(puzzle) == box ** 4:
+            return box
+    return 3
+
+def MakeBitCount(bits):
+    """Build a table of the number of bits set in every mask of a width
+    @param bits: width of the masks
+    @return: tuple
+
+    """
+    count = [0] * (1 << bits)
+    for mask in range(1, 1 << bits):
+        count[mask] = count[mask >> 1] + (mask & 1)
+    return tuple(count)
+
+# Tables of the standard 9x9 grid
+TABLES = GetTables(3)
+
+# Candidate digits and the mask with all of them set
+DIGITS = TABLES.digits
+ALL_DIGITS = TABLES.alldigits
+
+# Map of Square => cell index ('A1' => 0)
+INDEX = dict((square, idx) for idx, square in enumerate(SQUARES))
+
+# List of all Rows, Columns, Boxes as tuples of cell indexes
+UNIT_CELLS = TABLES.units
+
+# Cell index => (indexes of all cells that are in same unit)
+CELL_PEERS = TABLES.peers
+
+# Candidate mask => number of candidates in it
+BIT_COUNT = TABLES.bitcount
+
+# Map of digit <=> single candidate mask ('1' <=> 1, '2' <=> 2, '3' <=> 4)
+DIGIT_MASK = TABLES.digitmask
+MASK_DIGIT = TABLES.maskdigit
+
+#-----------------------------------------------------------------------------#
+
+class CancelToken(object):
+    """Flag for asking a running search to give up, that can be set from
+    another thread.
+
+    """
+    def __init__(self):
+        object.__init__(self)
+
+        # Attributes
+        self._cancelled = False
+
+    def Cancel(self):
+        """Ask the searches using this token to give up"""
+        self._cancelled = True
+
+    def IsCancelled(self):
+        """Has the token been cancelled
+        @return: bool
+
+        """
+        return self._cancelled
+
+class SolverStats(object):
+    """Counters collected during one search, when they are turned on with
+    L{SudokuSolver.SetStats}.
+
+    """
+    FIELDS = ('nodes', 'assignments', 'eliminations', 'maxdepth',
+              'backtracks', 'restarts', 'time')
+
+    def __init__(self):
+        object.__init__(self)
+
+        # Attributes
+        self.nodes = 0          # Search nodes visited
+        self.assignments = 0    # Cells solved by guesses or propagation
+        self.eliminations = 0   # Candidates removed
+        self.maxdepth = 0       # Most guesses on the search stack at once
+        self.backtracks = 0     # Dead ends where a branch had no candidates
+        self.restarts = 0       # Times the search started over
+        self.time = 0.0         # Wall time in seconds
+
+    def __repr__(self):
+        return "SolverStats(%s)" % ", ".join(["%s=%s" % (field,
+                                                         getattr(self, field))
+                                              for field in self.FIELDS])
+
+    def CountChanges(self, before, after, size):
+        """Add the candidates removed and the cells solved between two states
+        of the search to the counters.
+        @param before: sequence of the candidates of each cell
+        @param after: sequence of the same cells candidates after a step
+        @param size: callable that gives the number of candidates of a cell
+
+        """
+        for old, new in zip(before, after):
+            if old != new:
+                left = size(new)
+                self.eliminations += size(old) - left
+                if left == 1:
+                    self.assignments += 1
+
+    def GetDict(self):
+        """Get the counters as a dictionary
+        @return: dict of field => value
+
+        """
+        return dict([(field, getattr(self, field)) for field in self.FIELDS])
+
 #-----------------------------------------------------------------------------#
 
 class SudokuSolver:
     """Sudoku puzzle solver"""
-    def __init__(self, puzzle):
-        """Create the solver object"""
+    def __init__(self, puzzle, engine=ENGINE_DICT, trail=False, cache=None,
+                 stats=False, propagation=PROPAGATE_SINGLES):
+        """Create the solver object
+        @param puzzle: string, the size of the grid is taken from its length
+                       (see L{GetBoxSize})
+        @keyword engine: ENGINE_DICT, ENGINE_BITMASK or ENGINE_DLX
+        @keyword trail: undo changes from a trail on backtrack instead of
+                        searching each branch on a copy of the state
+        @keyword cache: L{solvecache.SolutionCache} to look solutions up in
+                        before searching or None
+        @keyword stats: collect a L{SolverStats} for each search
+        @keyword propagation: how much reasoning to do at each search node
+                              (see L{SetPropagation})
+
+        """
 
         # Attributes
         self._puzzle = puzzle
+        self._tables = GetTables(GetBoxSize(puzzle))
+        self._engine = engine
+        self._trail = trail
+        self._cache = cache
+        self._propagation = propagation
+        self._branching = BRANCH_MRV
+        self._order = ORDER_DIGITS
+        self._restarts = None   # Nodes before the first restart or None
+        self._seed = None       # Seed of the restarts random choices
+        self._restart = False   # Did the current run hit its cutoff
+        self._nodes = 0     # Search nodes visited
+        self._copies = 0    # State copies made for branches
+        self._trailed = 0   # Changes recorded on the trail
+        self._restarted = 0 # Times the search started over
+        self._status = None # Outcome of the last search
+        self._stats = None  # SolverStats of the last search or None if off
+        self._started = 0   # Time the current search started at
+        self.SetStats(stats)
+
+        # Search Limits
+        self._limited = False
+        self._budget = None     # Max search nodes
+        self._timeout = None    # Max seconds per search
+        self._deadline = None   # Time the current search must end by
+        self._cancel = None     # L{CancelToken}
+
+    def __GetChoices(self, cands, rng=None):
+        """Get the branches of a search node with the branching rule and
+        value order of the solver.
+        @param cands: list of candidate masks
+        @keyword rng: random.Random to break ties and order branches with
+        @return: list of (cell index, digit mask) to try, the last one
+                 first, or None if all cells are filled
+
+        """
+        tables = self._tables
+        if self._branching == BRANCH_RAREST:
+            found = ChooseRarestDigit(cands, tables)
+            if found is None:
+                return None
+            unit, bit = found
+            choices = [(cell, bit) for cell in unit if cands[cell] & bit]
+        else:
+            if self._branching == BRANCH_MRV_DEGREE:
+                best = ChooseCellDegree(cands, tables)
+            elif rng is not None:
+                best = rng.choice(MinCells(cands, tables) or [-1])
+            else:
+                best = ChooseCell(cands, tables)
+            if best < 0:
+                return None
+
+            choices = list()
+            mask = cands[best]
+            while mask:
+                bit = mask & -mask
+                choices.append((best, bit))
+                mask ^= bit
+
+        if rng is not None:
+            rng.shuffle(choices)
+        if self._order == ORDER_LCV:
+            # Most constraining first so the least constraining is tried
+            # first, the sort is stable so ties keep the shuffled order.
+            count = tables.bitcount
+            peers = tables.peers
+            def constrains(choice):
+                cell, bit = choice
+                return len([peer for peer in peers[cell]
+                            if cands[peer] & bit and count[cands[peer]] > 1])
+            choices.sort(key=constrains, reverse=True)
+        elif rng is None:
+            choices.reverse()
+        return choices
+
+    def __GiveUp(self):
+        """Check if the current search has to stop because it ran out of
+        nodes or time or was cancelled.
+        @return: bool
+
+        """
+        if (self._budget is not None and self._nodes > self._budget) or \
+           (self._deadline is not None and time.time() > self._deadline) or \
+           (self._cancel is not None and self._cancel.IsCancelled()):
+            self._status = STATUS_GAVE_UP
+            return True
+        return False
+
+    def __StartSearch(self):
+        """Reset the counters and limits for a new search"""
+        self._nodes = self._copies = self._trailed = self._restarted = 0
+        self._status = None
+        if self._stats is not None:
+            self._stats = SolverStats()
+            self._started = time.time()
+        if self._timeout is not None:
+            self._deadline = time.time() + self._timeout
+        else:
+            self._deadline = None
+
+    def __UpdateStats(self):
+        """Bring the node count and time of the current searches stats up
+        to date.
+
+        """
+        if self._stats is not None:
+            self._stats.nodes = self._nodes
+            self._stats.restarts = self._restarted
+            self._stats.time = time.time() - self._started
+
+    def __ParseMasks(self):
+        """Given a puzzle string, return a list of candidate masks"""
+        tables = self._tables
+        cands = [tables.alldigits] * tables.cells
+        queue = list()
+        for cell, digit in enumerate(self._puzzle[:tables.cells]):
+            if digit in tables.digitmask:
+                cands[cell] = tables.digitmask[digit]
+                queue.append(cell)
+        givens = cands[:]
+        cands = PropagateMasks(cands, queue, tables=tables)
+        if self._propagation and cands is not False:
+            cands = PropagateSubsets(cands, None, tables, self._propagation)
+        if self._stats is not None and cands is not False:
+            self._stats.CountChanges(givens, cands,
+                                     tables.bitcount.__getitem__)
+        return cands
 
     def __ParsePuzzle(self):
         """Given a string of 81 digits, return a dict of {cell:values}"""
@@ -68,44 +480,528 @@ class SudokuSolver:
                 return False
         return values
 
-    def __Search(self, vmap):
-        """Using depth-first search and propagation, try all possible values."""
+    def __Search(self, vmap, trail=None):
+        """Using depth-first search and propagation, try all possible values.
+        The search keeps its own stack instead of recursing, so the limits
+        are checked at every node.
+        @keyword trail: list to record changes on so a failed branch can be
+                        rolled back, or None to search on copies of vmap
+        @return: solved dict or False
+
+        """
+        stats = self._stats
+
         # Check if failed earlier
         if vmap is False:
+            if stats is not None:
+                stats.backtracks += 1
             return False
 
-        # Check if its been solved
-        if All(len(vmap[s]) == 1 for s in SQUARES):
-            return vmap
+        # Stack of [digits left to try last first, square, trail mark or
+        # node state]
+        stack = list()
+        while True:
+            # Check if its been solved
+            self._nodes += 1
+            if self._limited and self.__GiveUp():
+                return False
+            if All(len(vmap[s]) == 1 for s in SQUARES):
+                return vmap
+
+            # Choose the unfilled square s with the fewest possibilities
+            _, square = min((len(vmap[square]), square)
+                            for square in SQUARES
+                            if len(vmap[square]) > 1)
+            digits = list(reversed(vmap[square]))
+            if trail is None:
+                stack.append([digits, square, vmap])
+            else:
+                stack.append([digits, square, len(trail)])
+            if stats is not None and len(stack) > stats.maxdepth:
+                stats.maxdepth = len(stack)
+
+            # Move on to the next branch, backtracking as needed
+            while stack:
+                digits, square, saved = stack[-1]
+                if trail is not None:
+                    self._trailed += len(trail) - saved
+                    Undo(vmap, trail, saved)
+
+                if not digits:
+                    stack.pop()
+                    continue
+
+                digit = digits.pop()
+                if trail is None:
+                    before = saved
+                    self._copies += 1
+                    branch = Assign(saved.copy(), square, digit)
+                else:
+                    if stats is not None:
+                        before = vmap.copy()
+                    branch = Assign(vmap, square, digit, trail)
+
+                if stats is not None:
+                    if branch is False:
+                        stats.backtracks += 1
+                    else:
+                        stats.CountChanges([before[key] for key in SQUARES],
+                                           [branch[key] for key in SQUARES],
+                                           len)
+
+                if branch is not False:
+                    vmap = branch
+                    break
+            else:
+                return False
+
+    def __Solve(self, engine):
+        """Search for the first solution of the puzzle
+        @param engine: engine to search with
+        @return: list or None
+
+        """
+        if self._restarts and engine != ENGINE_DLX:
+            return self.__SolveRestarts()
+
+        if engine in (ENGINE_BITMASK, ENGINE_DLX) or self._tables.box != 3 \
+           or self._propagation or self._branching or self._order:
+            for solution in self.IterSolutions(engine):
+                return solution
+            return None
+
+        self.__StartSearch()
+        if self._trail:
+            trail = list()
+        else:
+            trail = None
+
+        vmap = self.__ParsePuzzle()
+        if self._stats is not None and vmap:
+            givens = [(digit in DIGITS and digit) or DIGITS
+                      for digit in self._puzzle[:81]]
+            self._stats.CountChanges(givens, [vmap[key] for key in SQUARES],
+                                     len)
+
+        result = self.__Search(vmap, trail)
+        self.__UpdateStats()
+        if trail:
+            self._trailed += len(trail)
+        if result:
+            self._status = STATUS_SOLVED
+            return [result[key] for key in sorted(result.keys())]
+        else:
+            if self._status is None:
+                self._status = STATUS_NO_SOLUTION
+            return None
+
+    def __SolveRestarts(self):
+        """Search for the first solution of the puzzle with the bitmask
+        engine, breaking ties at random and starting over with a new random
+        sequence each time the search uses up its node cutoff. The cutoff
+        doubles on each restart so the search stays complete.
+        @return: list or None
+
+        """
+        self.__StartSearch()
+        rng = random.Random(self._seed)
+        cutoff = self._restarts
+        while True:
+            if self._trail:
+                trail = list()
+            else:
+                trail = None
+
+            self._restart = False
+            for solution in self.__IterMasks(self.__ParseMasks(), trail, rng,
+                                             self._nodes + cutoff):
+                self._status = STATUS_SOLVED
+                self.__UpdateStats()
+                return solution
+
+            if not self._restart or self._status == STATUS_GAVE_UP:
+                break
+            self._restarted += 1
+            cutoff *= 2
+
+        self.__UpdateStats()
+        if self._status is None:
+            self._status = STATUS_NO_SOLUTION
+        return None
+
+    def __IterMasks(self, cands, trail=None, rng=None, cutoff=None):
+        """Depth-first search that yields every solution of the candidates.
+        The search keeps its own stack instead of recursing, and stops when
+        the search limits are reached.
+        @param cands: list of candidate masks or False
+        @keyword trail: list to record changes on or None to copy cands
+        @keyword rng: random.Random to break ties and order branches with
+        @keyword cutoff: node count to stop at and ask for a restart
+        @return: generator of lists of digits
+
+        """
+        if cands is False:
+            return
+
+        tables = self._tables
+        maskdigit = tables.maskdigit
+        propagation = self._propagation
+        stats = self._stats
+        if stats is not None:
+            bitcount = tables.bitcount.__getitem__
+
+        # Stack of [(cell, digit mask) branches left to try last first,
+        # trail mark or node state]
+        stack = list()
+        while True:
+            self._nodes += 1
+            if self._limited and self.__GiveUp():
+                return
+            if cutoff is not None and self._nodes > cutoff:
+                self._restart = True
+                return
+
+            choices = self.__GetChoices(cands, rng)
+            if choices is None:
+                yield [maskdigit[mask] for mask in cands]
+            elif trail is None:
+                stack.append([choices, cands])
+            else:
+                stack.append([choices, len(trail)])
+            if stats is not None and len(stack) > stats.maxdepth:
+                stats.maxdepth = len(stack)
+
+            # Move on to the next branch, backtracking as needed
+            while stack:
+                choices, saved = stack[-1]
+                if trail is not None:
+                    self._trailed += len(trail) - saved
+                    Undo(cands, trail, saved)
+
+                if not choices:
+                    stack.pop()
+                    continue
+
+                cell, bit = choices.pop()
+                if trail is None:
+                    self._copies += 1
+                    before = saved
+                    branch = saved[:]
+                    branch[cell] = bit
+                    branch = PropagateMasks(branch, [cell], tables=tables)
+                else:
+                    if stats is not None:
+                        before = cands[:]
+                    trail.append((cell, cands[cell]))
+                    cands[cell] = bit
+                    branch = PropagateMasks(cands, [cell], trail, tables)
+
+                if propagation and branch is not False:
+                    branch = PropagateSubsets(branch, trail, tables,
+                                              propagation)
+                if stats is not None:
+                    if branch is False:
+                        stats.backtracks += 1
+                    else:
+                        stats.CountChanges(before, branch, bitcount)
+
+                if branch is not False:
+                    cands = branch
+                    break
+            else:
+                return
+
+    def CountSolutions(self, limit=2, engine=None):
+        """Count the solutions of the puzzle, stopping the search as soon as
+        limit of them have been found.
+        @keyword limit: int
+        @keyword engine: engine to search with or None for the solvers engine
+        @return: int (0 <= count <= limit)
+        @note: ENGINE_DICT counts with the bitmask engine
+
+        """
+        count = 0
+        if limit > 0:
+            for solution in self.IterSolutions(engine):
+                count += 1
+                if count >= limit:
+                    break
+        return count
+
+    def GetBranching(self):
+        """Get the rule used to choose what to branch on in the search
+        @return: BRANCH_MRV, BRANCH_MRV_DEGREE or BRANCH_RAREST
+
+        """
+        return self._branching
+
+    def GetCache(self):
+        """Get the solution cache used by L{GetSolution}
+        @return: L{solvecache.SolutionCache} or None
+
+        """
+        return self._cache
+
+    def GetBoxSize(self):
+        """Get the box size of the puzzles grid
+        @return: int (3 for the standard 9x9 grid)
+
+        """
+        return self._tables.box
 
-        # Choose the unfilled square s with the fewest possibilities
-        _, square = min((len(vmap[square]), square)
-                        for square in SQUARES
-                        if len(vmap[square]) > 1)
-        return Some(self.__Search(Assign(vmap.copy(), square, digit))
-                    for digit in vmap[square])
+    def GetCounters(self):
+        """Get the counters from the last search
+        @return: dict(nodes=int, copies=int, trailed=int, restarts=int)
+        @note: nodes is the number of search nodes visited, copies the number
+               of state copies allocated, trailed the number of changes
+               recorded on the undo trail and restarts the number of times
+               the search started over (see L{SetRestarts}).
 
-    def GetValue(self, idx):
+        """
+        return dict(nodes=self._nodes, copies=self._copies,
+                    trailed=self._trailed, restarts=self._restarted)
+
+    def GetEngine(self):
+        """Get the engine used to solve the puzzle
+        @return: ENGINE_DICT, ENGINE_BITMASK or ENGINE_DLX
+
+        """
+        return self._engine
+
+    def GetValue(self, idx, engine=None):
         """Get the value for a given index in the puzzle if it exists
         @param idx: int
+        @keyword engine: engine to solve with or None for the solvers engine
         @return: string or None
 
         """
-        sol = self.GetSolution()
+        sol = self.GetSolution(engine)
         if sol:
             return sol[idx]
         return sol
 
-    def GetSolution(self):
-        """Get the ordered list of the puzzles solution
+    def GetValueOrder(self):
+        """Get the order the digits of a branch are tried in
+        @return: ORDER_DIGITS or ORDER_LCV
+
+        """
+        return self._order
+
+    def GetPropagation(self):
+        """Get how much reasoning the search does at each node
+        @return: PROPAGATE_SINGLES, PROPAGATE_POINTING, PROPAGATE_PAIRS or
+                 PROPAGATE_TRIPLES
+
+        """
+        return self._propagation
+
+    def GetRestarts(self):
+        """Get the node cutoff of the first run of a restarting search
+        @return: int or None if the search does not restart
+
+        """
+        return self._restarts
+
+    def GetSolution(self, engine=None):
+        """Get the ordered list of the puzzles solution. When the solver has
+        a cache it is checked first and the result of the search is stored
+        in it, unless the search gave up.
+        @keyword engine: engine to solve with or None for the solvers engine
         @return: list or None
+        @note: ENGINE_DICT searches with the bitmask engine for grids other
+               than 9x9 or when the propagation or the search heuristics are
+               not the defaults, the cache is only used for 9x9 grids and
+               passes over sparse ones (see L{solvecache.MIN_CLUES})
 
         """
-        result = self.__Search(self.__ParsePuzzle())
-        if result:
-            return [result[key] for key in sorted(result.keys())]
+        if engine is None:
+            engine = self._engine
+
+        cache = self._cache
+        if self._tables.box != 3:
+            cache = None
+
+        if cache is not None:
+            cached = cache.Get(self._puzzle)
+            if cached is not None:
+                self.__StartSearch()
+                self.__UpdateStats()
+                if cached:
+                    self._status = STATUS_SOLVED
+                    return list(cached)
+                self._status = STATUS_NO_SOLUTION
+                return None
+
+        result = self.__Solve(engine)
+        if cache is not None and self._status != STATUS_GAVE_UP:
+            cache.Put(self._puzzle, result)
+        return result
+
+    def GetStats(self):
+        """Get the statistics of the last search
+        @return: L{SolverStats} or None if collecting them is turned off
+        @note: assignments and eliminations are counted for the propagations
+               that do not fail, the DLX engine only counts the rows it
+               selects as assignments.
+
+        """
+        return self._stats
+
+    def GetStatus(self):
+        """Get the outcome of the last search
+        @return: STATUS_SOLVED, STATUS_NO_SOLUTION, STATUS_GAVE_UP or None
+                 if no search has been run.
+
+        """
+        return self._status
+
+    def IsUnique(self, engine=None):
+        """Check if the puzzle has exactly one solution
+        @keyword engine: engine to search with or None for the solvers engine
+        @return: bool
+
+        """
+        return self.CountSolutions(2, engine) == 1
+
+    def IterSolutions(self, engine=None):
+        """Iterate over all the solutions of the puzzle. Solutions are found
+        one at a time as the iterator is advanced, so the rest of the search
+        costs nothing if the caller stops early.
+        @keyword engine: engine to search with or None for the solvers engine
+        @return: generator of ordered lists of the solutions digits
+        @note: ENGINE_DICT searches with the bitmask engine
+
+        """
+        if engine is None:
+            engine = self._engine
+
+        self.__StartSearch()
+        if engine == ENGINE_DLX:
+            matrix = DancingLinks(self._tables.box)
+            solutions = list()
+            def check():
+                """Check the limits against the matrix search"""
+                self._nodes = matrix.nodes
+                return self.__GiveUp()
+
+            if matrix.SelectPuzzle(self._puzzle):
+                if not self._limited:
+                    check = None
+                solutions = matrix.IterSearch(check, self._stats)
+            for rows in solutions:
+                self._nodes = matrix.nodes
+                self._status = STATUS_SOLVED
+                self.__UpdateStats()
+                yield matrix.GetDigits(rows)
+            self._nodes = matrix.nodes
         else:
-            return None
+            if self._trail:
+                trail = list()
+            else:
+                trail = None
+            for solution in self.__IterMasks(self.__ParseMasks(), trail):
+                self._status = STATUS_SOLVED
+                self.__UpdateStats()
+                yield solution
+
+        self.__UpdateStats()
+        if self._status is None:
+            self._status = STATUS_NO_SOLUTION
+
+    def SetBranching(self, rule):
+        """Set the rule used to choose what to branch on in the search
+        @param rule: BRANCH_MRV to branch on the values of the cell with the
+                     fewest candidates, BRANCH_MRV_DEGREE to break ties
+                     between those cells by their number of open peers or
+                     BRANCH_RAREST to branch on the places of the digit with
+                     the fewest places left in a unit
+        @note: the DLX engine always branches on its smallest column
+
+        """
+        self._branching = rule
+
+    def SetCache(self, cache):
+        """Set the solution cache used by L{GetSolution}
+        @param cache: L{solvecache.SolutionCache} or None
+
+        """
+        self._cache = cache
+
+    def SetEngine(self, engine):
+        """Set the engine used to solve the puzzle
+        @param engine: ENGINE_DICT, ENGINE_BITMASK or ENGINE_DLX
+
+        """
+        self._engine = engine
+
+    def SetLimits(self, budget=None, timeout=None, cancel=None):
+        """Set limits that make a search give up instead of running to the
+        end. When a search gives up it returns as if there was no solution
+        and L{GetStatus} returns STATUS_GAVE_UP.
+        @keyword budget: max number of search nodes or None
+        @keyword timeout: max seconds per search or None
+        @keyword cancel: L{CancelToken} or None
+        @note: The limits are checked at every search node.
+
+        """
+        self._budget = budget
+        self._timeout = timeout
+        self._cancel = cancel
+        self._limited = budget is not None or timeout is not None or \
+                        cancel is not None
+
+    def SetPropagation(self, level):
+        """Set how much reasoning the search does at each node. Stronger
+        propagation makes each node slower but can take many nodes off the
+        search of hard puzzles.
+        @param level: PROPAGATE_SINGLES, PROPAGATE_POINTING, PROPAGATE_PAIRS
+                      or PROPAGATE_TRIPLES
+        @note: the DLX engine always only propagates singles and the dict
+               engine searches with the bitmask engine for the other levels
+
+        """
+        self._propagation = level
+
+    def SetRestarts(self, cutoff, seed=None):
+        """Make searches for the first solution restart with new random
+        choices when they take too many nodes, which cuts off the long tail
+        of unlucky searches. The cutoff doubles after each restart.
+        @param cutoff: nodes before the first restart or None to turn
+                       restarts off
+        @keyword seed: seed for the random choices, the same seed gives the
+                       same search
+        @note: only L{GetSolution} restarts, iterating and counting the
+               solutions needs a single complete search
+
+        """
+        self._restarts = cutoff
+        self._seed = seed
+
+    def SetStats(self, stats):
+        """Turn collecting statistics for each search on or off. When off
+        the searches only pay for a check per node.
+        @param stats: bool
+
+        """
+        if not stats:
+            self._stats = None
+        elif self._stats is None:
+            self._stats = SolverStats()
+
+    def SetValueOrder(self, order):
+        """Set the order the digits of a branch are tried in
+        @param order: ORDER_DIGITS or ORDER_LCV to try first the digit that
+                      removes the fewest candidates from the open peers
+
+        """
+        self._order = order
+
+    def SetTrail(self, trail):
+        """Set whether to undo from a trail or copy state while searching
+        @param trail: bool
+
+        """
+        self._trail = trail
 
     def SetPuzzle(self, puzzle):
         """Set the puzzle that this solver owns
@@ -113,52 +1009,684 @@ class SudokuSolver:
 
         """
         self._puzzle = puzzle
+        self._tables = GetTables(GetBoxSize(puzzle))
+
+    def SplitSearch(self, count):
+        """Split the search into independent parts that can be searched on
+        their own, by expanding the top of the search tree breadth first
+        with the solvers branching rule and propagation until there are at
+        least count parts or every part is solved.
+        @param count: number of parts wanted
+        @return: list of puzzle strings in the order the search would try
+                 them, each one the puzzle with the cells solved in one
+                 branch filled in. The solutions of the puzzle are the
+                 solutions of the parts, the list is empty when splitting
+                 finds that the puzzle has none.
+
+        """
+        tables = self._tables
+        cands = self.__ParseMasks()
+        if cands is False:
+            return list()
+
+        # Expand the parts in turn, replacing each one with its branches
+        parts = [cands]
+        pos = 0
+        expanded = False    # Was a part expanded on this pass
+        while len(parts) < count:
+            if pos >= len(parts):
+                if not expanded:
+                    break
+                pos = 0
+                expanded = False
+
+            choices = self.__GetChoices(parts[pos])
+            if choices is None:
+                # Solved
+                pos += 1
+                continue
+
+            branches = list()
+            while choices:
+                cell, bit = choices.pop()
+                branch = parts[pos][:]
+                branch[cell] = bit
+                branch = PropagateMasks(branch, [cell], tables=tables)
+                if self._propagation and branch is not False:
+                    branch = PropagateSubsets(branch, None, tables,
+                                              self._propagation)
+                if branch is not False:
+                    branches.append(branch)
+            parts[pos:pos + 1] = branches
+            pos += len(branches)
+            expanded = True
+
+        maskdigit = tables.maskdigit
+        return [''.join([maskdigit.get(mask, '.') for mask in part])
+                for part in parts]
 
 #-----------------------------------------------------------------------------#
 
-def Assign(values, square, digit):
+class DancingLinks(object):
+    """Exact cover matrix of the 4 * cells Sudoku constraints, with one row
+    for each (cell, digit) placement, that is searched with Knuth's
+    Algorithm X using dancing links. For the 9x9 grid that is 324 columns
+    and 729 rows.
+
+    Constraint columns are numbered from 1 (0 is the root header), with
+    N the width of the grid:
+      - 1 + cell: the cell has a digit
+      - 1 + N * N + row * N + digit: the row has the digit
+      - 1 + 2 * N * N + column * N + digit: the column has the digit
+      - 1 + 3 * N * N + box * N + digit: the box has the digit
+
+    Matrix row r is the placement of digit r % N in cell r / N.
+
+    """
+    # Box size => link arrays of an empty matrix, shared by all instances
+    _templates = dict()
+
+    def __init__(self, box=3):
+        """Create a fresh copy of the constraint matrix
+        @keyword box: box size of the grid
+
+        """
+        object.__init__(self)
+
+        if box not in DancingLinks._templates:
+            DancingLinks._templates[box] = MakeExactCover(box)
+        left, right, up, down, column, size, rowid, first = \
+            DancingLinks._templates[box]
+
+        # Attributes
+        self.left = left[:]
+        self.right = right[:]
+        self.up = up[:]
+        self.down = down[:]
+        self.size = size[:]
+        self.column = column    # Node => column header (read only)
+        self.rowid = rowid      # Node => matrix row (read only)
+        self.first = first      # Matrix row => first node (read only)
+        self.nodes = 0          # Search nodes visited
+        self._tables = GetTables(box)
+        self._selected = list() # Matrix rows in the partial solution
+
+    def ChooseColumn(self):
+        """Choose the column with the fewest rows left
+        @return: column header node (0 if all columns are covered)
+
+        """
+        right, size = self.right, self.size
+        col = right[0]
+        best = col
+        fewest = size[col]
+        while col and fewest > 1:
+            if size[col] < fewest:
+                best = col
+                fewest = size[col]
+            col = right[col]
+        return best
+
+    def Cover(self, col):
+        """Remove a column and all the rows that satisfy it from the matrix
+        @param col: column header node
+
+        """
+        left, right, up, down = self.left, self.right, self.up, self.down
+        size, column = self.size, self.column
+        right[left[col]] = right[col]
+        left[right[col]] = left[col]
+        node = down[col]
+        while node != col:
+            node2 = right[node]
+            while node2 != node:
+                down[up[node2]] = down[node2]
+                up[down[node2]] = up[node2]
+                size[column[node2]] -= 1
+                node2 = right[node2]
+            node = down[node]
+
+    def Uncover(self, col):
+        """Put back a column removed by L{Cover}
+        @param col: column header node
+
+        """
+        left, right, up, down = self.left, self.right, self.up, self.down
+        size, column = self.size, self.column
+        node = up[col]
+        while node != col:
+            node2 = left[node]
+            while node2 != node:
+                size[column[node2]] += 1
+                down[up[node2]] = node2
+                up[down[node2]] = node2
+                node2 = left[node2]
+            node = up[node]
+        right[left[col]] = col
+        left[right[col]] = col
+
+    def GetDigits(self, rows):
+        """Convert a complete list of matrix rows to the ordered list of
+        the solutions digits.
+        @param rows: list of matrix rows
+        @return: list
+
+        """
+        width = self._tables.size
+        digits = [None] * self._tables.cells
+        for row in rows:
+            digits[row / width] = self._tables.digits[row % width]
+        return digits
+
+    def IterSearch(self, check=None, stats=None):
+        """Search for every set of rows that covers all the remaining
+        columns, one at a time. The search keeps its own stack instead of
+        recursing.
+        @keyword check: callable that returns True to stop the search, it is
+                        called once per search node.
+        @keyword stats: L{SolverStats} to count the rows selected as
+                        assignments and the empty columns as backtracks in
+        @return: generator of lists of matrix rows (including the selected
+                 ones)
+
+        """
+        right, left, down = self.right, self.left, self.down
+        column = self.column
+
+        # Stack of [column, current row node]
+        stack = list()
+        while True:
+            self.nodes += 1
+            if check is not None and check():
+                return
+
+            best = self.ChooseColumn()
+            if not best:
+                yield list(self._selected)
+            else:
+                self.Cover(best)
+                stack.append([best, best])
+                if stats is not None:
+                    stats.maxdepth = max(stats.maxdepth, len(stack))
+                    if not self.size[best]:
+                        stats.backtracks += 1
+
+            # Move on to the next row, backtracking as needed
+            while stack:
+                frame = stack[-1]
+                col, node = frame
+                if node != col:
+                    # Take back the row tried last
+                    node2 = left[node]
+                    while node2 != node:
+                        self.Uncover(column[node2])
+                        node2 = left[node2]
+                    self._selected.pop()
+
+                node = down[node]
+                if node == col:
+                    self.Uncover(col)
+                    stack.pop()
+                    continue
+
+                frame[1] = node
+                if stats is not None:
+                    stats.assignments += 1
+                self._selected.append(self.rowid[node])
+                node2 = right[node]
+                while node2 != node:
+                    self.Cover(column[node2])
+                    node2 = right[node2]
+                break
+            else:
+                return
+
+    def Select(self, row):
+        """Put a matrix row in the solution by covering all its columns
+        @param row: matrix row
+        @return: bool (False if the row conflicts with the selected rows)
+
+        """
+        node = self.first[row]
+        for node2 in (node, node + 1, node + 2, node + 3):
+            col = self.column[node2]
+            if self.right[self.left[col]] != col:
+                return False
+        for node2 in (node, node + 1, node + 2, node + 3):
+            self.Cover(self.column[node2])
+        self._selected.append(row)
+        return True
+
+    def SelectPuzzle(self, puzzle):
+        """Select the rows for all the givens of a puzzle string
+        @param puzzle: string
+        @return: bool (False if the givens conflict)
+
+        """
+        tables = self._tables
+        self._selected = list()
+        for cell, digit in enumerate(puzzle[:tables.cells]):
+            if digit in tables.digitmask and \
+               not self.Select(cell * tables.size + tables.digits.index(digit)):
+                return False
+        return True
+
+#-----------------------------------------------------------------------------#
+
+def Assign(values, square, digit, trail=None):
     """Eliminate all the other values (except d) from values[s] and propagate.
     @param values: dict ('A1' => '12345')
     @param square: square to check
     @param digit: digit t
+    @keyword trail: list to record (square, old values) changes on
 
     """
-    if All(Eliminate(values, square, digit2)
-           for digit2 in values[square]
-           if digit2 != digit):
-        return values
-    else:
-        return False
+    return PropagateValues(values, [(square, digit2)
+                                    for digit2 in values[square]
+                                    if digit2 != digit], trail)
 
-def Eliminate(values, square, digit):
-    """Eliminate d from values[s]; propagate when values or places <= 2"""
-    # Check if already eliminated
-    if digit not in values[square]:
-        return values
+def Eliminate(values, square, digit, trail=None):
+    """Eliminate d from values[s]; propagate when values or places <= 2
+    @keyword trail: list to record (square, old values) changes on
 
-    values[square] = values[square].replace(digit, '')
-    if len(values[square]) == 0:
-        # Contradiction: removed last value
-        return False
-    elif len(values[square]) == 1:
-        # If there is only one value (digit2) left in a square
-        # then remove it from its peers
-        digit2 = values[square]
-        if not All(Eliminate(values, square2, digit2)
-                   for square2 in PEERS[square]):
+    """
+    return PropagateValues(values, [(square, digit)], trail)
+
+def MinCells(cands, tables=TABLES):
+    """Get all the unfilled cells that have the fewest candidates
+    @param cands: list of candidate masks
+    @keyword tables: L{GridTables} of the grid size
+    @return: list of cell indexes (empty if all cells are filled)
+
+    """
+    count = tables.bitcount
+    cells = list()
+    fewest = tables.size + 1
+    for cell, mask in enumerate(cands):
+        ncands = count[mask]
+        if ncands > 1:
+            if ncands < fewest:
+                cells = [cell]
+                fewest = ncands
+            elif ncands == fewest:
+                cells.append(cell)
+    return cells
+
+def PropagateMasks(cands, queue, trail=None, tables=TABLES, dirty=None):
+    """Remove the value of each solved cell in queue from its peers and
+    assign digits that have only one place left in a unit, until nothing
+    more can be deduced.
+    @param cands: list of candidate masks (cell index => mask)
+    @param queue: list of cell indexes that have just been solved
+    @keyword trail: list to record (cell, old mask) changes on
+    @keyword tables: L{GridTables} of the grid size
+    @keyword dirty: set of indexes of other units that changed
+    @return: cands or False on a contradiction
+
+    """
+    peers = tables.peers
+    units = tables.units
+    cellunits = tables.cellunits
+    alldigits = tables.alldigits
+
+    # Units that changed since they were last checked for hidden singles,
+    # the others can not have any.
+    if dirty is None:
+        dirty = set()
+    for cell in queue:
+        dirty.update(cellunits[cell])
+
+    while True:
+        # If there is only one value left in a cell remove it from its peers
+        while queue:
+            cell = queue.pop()
+            mask = cands[cell]
+            for peer in peers[cell]:
+                pmask = cands[peer]
+                if pmask & mask:
+                    pmask ^= mask
+                    if not pmask:
+                        # Contradiction: removed last value
+                        return False
+                    if trail is not None:
+                        trail.append((peer, pmask | mask))
+                    cands[peer] = pmask
+                    dirty.update(cellunits[peer])
+                    if not pmask & (pmask - 1):
+                        queue.append(peer)
+
+        if not dirty:
+            return cands
+
+        # A digit with only one place in a unit must be assigned there
+        check = dirty
+        dirty = set()
+        for uidx in check:
+            unit = units[uidx]
+            once = twice = 0
+            for cell in unit:
+                mask = cands[cell]
+                twice |= once & mask
+                once |= mask
+            if once != alldigits:
+                # Contradiction: a digit has no place left in the unit
+                return False
+
+            hidden = once & ~twice
+            if hidden:
+                for cell in unit:
+                    mask = cands[cell]
+                    only = mask & hidden
+                    if only and only != mask:
+                        if only & (only - 1):
+                            # Contradiction: two digits need the same cell
+                            return False
+                        if trail is not None:
+                            trail.append((cell, mask))
+                        cands[cell] = only
+                        dirty.update(cellunits[cell])
+                        queue.append(cell)
+
+def PropagateSubsets(cands, trail=None, tables=TABLES,
+                    level=PROPAGATE_TRIPLES):
+    """Remove candidates with pointing pairs, box line reduction and naked
+    and hidden subsets, propagating singles again after each round that
+    changed something, until nothing more can be deduced.
+    @param cands: list of candidate masks that singles have been propagated
+                  on (see L{PropagateMasks})
+    @keyword trail: list to record (cell, old mask) changes on
+    @keyword tables: L{GridTables} of the grid size
+    @keyword level: PROPAGATE_POINTING, PROPAGATE_PAIRS or PROPAGATE_TRIPLES
+    @return: cands or False on a contradiction
+
+    """
+    bitcount = tables.bitcount
+    units = tables.units
+    cellunits = tables.cellunits
+    largest = level - PROPAGATE_POINTING + 1    # Largest subset size
+
+    # Units that changed since the last round, the others can not give any
+    # new deductions.
+    check = None
+    while True:
+        # Cell index => candidates to remove from it, all found on the same
+        # state so a round can not undo its own reasoning.
+        removed = dict()
+
+        # A digit of a box that is only in one of its lines can not be in
+        # the rest of the line and the other way around.
+        for bidx, lidx, both, boxrest, linerest in tables.intersections:
+            if check is not None and bidx not in check and lidx not in check:
+                continue
+            inside = boxmask = linemask = 0
+            for cell in both:
+                inside |= cands[cell]
+            for cell in boxrest:
+                boxmask |= cands[cell]
+            for cell in linerest:
+                linemask |= cands[cell]
+
+            for rest, only in ((linerest, inside & ~boxmask),
+                               (boxrest, inside & ~linemask)):
+                if only:
+                    for cell in rest:
+                        if cands[cell] & only:
+                            removed[cell] = removed.get(cell, 0) | only
+
+        if largest > 1:
+            if check is None:
+                check = range(len(units))
+            for uidx in check:
+                unit = units[uidx]
+                open_cells = [cell for cell in unit
+                              if bitcount[cands[cell]] > 1]
+                if len(open_cells) < 3:
+                    continue
+
+                # Where each open digit can go, as bits of open_cells
+                places = dict()
+                for pos, cell in enumerate(open_cells):
+                    mask = cands[cell]
+                    while mask:
+                        bit = mask & -mask
+                        places[bit] = places.get(bit, 0) | (1 << pos)
+                        mask ^= bit
+
+                for size in range(2, min(largest, len(open_cells) - 1) + 1):
+                    # Naked subset: size cells with only size digits
+                    small = [cell for cell in open_cells
+                             if bitcount[cands[cell]] <= size]
+                    for subset in itertools.combinations(small, size):
+                        union = 0
+                        for cell in subset:
+                            union |= cands[cell]
+                        if bitcount[union] == size:
+                            for cell in open_cells:
+                                if cell not in subset and cands[cell] & union:
+                                    removed[cell] = removed.get(cell, 0) | \
+                                                    union
+
+                    # Hidden subset: size digits with only size places
+                    rare = [bit for bit, where in places.iteritems()
+                            if bitcount[where] <= size]
+                    for subset in itertools.combinations(rare, size):
+                        where = digits = 0
+                        for bit in subset:
+                            where |= places[bit]
+                            digits |= bit
+                        if bitcount[where] == size:
+                            for pos, cell in enumerate(open_cells):
+                                if where & (1 << pos) and cands[cell] & ~digits:
+                                    removed[cell] = removed.get(cell, 0) | \
+                                                    ~digits
+
+        if not removed:
+            return cands
+
+        queue = list()
+        dirty = set()
+        before = cands[:]
+        for cell, bits in removed.iteritems():
+            mask = cands[cell]
+            left = mask & ~bits
+            if not left:
+                # Contradiction: removed last value
+                return False
+            if trail is not None:
+                trail.append((cell, mask))
+            cands[cell] = left
+            dirty.update(cellunits[cell])
+            if not left & (left - 1):
+                queue.append(cell)
+
+        if PropagateMasks(cands, queue, trail, tables, dirty) is False:
             return False
 
-    # Check the places where the digit appears in the units of the square
-    for unit in UNITS[square]:
-        dplaces = [square for square in unit if digit in values[square]]
-        if len(dplaces) == 0:
+        check = set()
+        for cell, mask in enumerate(before):
+            if cands[cell] != mask:
+                check.update(cellunits[cell])
+
+def PropagateValues(values, queue, trail=None):
+    """Make the eliminations in queue and everything that follows from them
+    on a dict of values. The eliminations are worked off a list instead of
+    recursing, the last one queued is made first.
+    @param values: dict ('A1' => '12345')
+    @param queue: list of (square, digit) to eliminate
+    @keyword trail: list to record (square, old values) changes on
+    @return: values or False on a contradiction
+
+    """
+    while queue:
+        square, digit = queue.pop()
+
+        # Check if already eliminated
+        if digit not in values[square]:
+            continue
+
+        if trail is not None:
+            trail.append((square, values[square]))
+        values[square] = values[square].replace(digit, '')
+        if len(values[square]) == 0:
+            # Contradiction: removed last value
             return False
-        elif len(dplaces) == 1:
-            # A digit can only be in one place in a unit so assign it there
-            if not Assign(values, dplaces[0], digit):
+        elif len(values[square]) == 1:
+            # If there is only one value (digit2) left in a square
+            # then remove it from its peers
+            digit2 = values[square]
+            queue.extend([(square2, digit2) for square2 in PEERS[square]])
+
+        # Check the places where the digit appears in the units of the square
+        for unit in UNITS[square]:
+            dplaces = [square2 for square2 in unit if digit in values[square2]]
+            if len(dplaces) == 0:
                 return False
+            elif len(dplaces) == 1:
+                # A digit can only be in one place in a unit so assign it there
+                place = dplaces[0]
+                queue.extend([(place, digit3) for digit3 in values[place]
+                              if digit3 != digit])
     return values
 
+def Undo(values, trail, mark):
+    """Roll values back to the state they were in when the trail was mark
+    entries long.
+    @param values: dict of candidate strings or list of candidate masks
+    @param trail: list of (key, old value) changes
+    @param mark: int
+
+    """
+    while len(trail) > mark:
+        key, old = trail.pop()
+        values[key] = old
+
+def ChooseCell(cands, tables=TABLES):
+    """Choose the unfilled cell with the fewest candidates
+    @param cands: list of candidate masks
+    @keyword tables: L{GridTables} of the grid size
+    @return: cell index or -1 if all cells are filled
+
+    """
+    count = tables.bitcount
+    best = -1
+    fewest = tables.size + 1
+    for cell, mask in enumerate(cands):
+        ncands = count[mask]
+        if ncands > 1 and ncands < fewest:
+            best = cell
+            fewest = ncands
+            if ncands == 2:
+                break
+    return best
+
+def ChooseCellDegree(cands, tables=TABLES):
+    """Choose the unfilled cell with the fewest candidates, breaking ties by
+    the number of unfilled peers so the choice constrains the most cells.
+    @param cands: list of candidate masks
+    @keyword tables: L{GridTables} of the grid size
+    @return: cell index or -1 if all cells are filled
+
+    """
+    cells = MinCells(cands, tables)
+    if len(cells) < 2:
+        return (cells or [-1])[0]
+
+    count = tables.bitcount
+    peers = tables.peers
+    best = -1
+    most = -1
+    for cell in cells:
+        degree = 0
+        for peer in peers[cell]:
+            if count[cands[peer]] > 1:
+                degree += 1
+        if degree > most:
+            best = cell
+            most = degree
+    return best
+
+def ChooseRarestDigit(cands, tables=TABLES):
+    """Choose the digit that has the fewest places left in one of the units
+    @param cands: list of candidate masks
+    @keyword tables: L{GridTables} of the grid size
+    @return: (unit, digit mask) or None if all cells are filled
+
+    """
+    count = tables.bitcount
+    best = None
+    fewest = tables.size + 1
+    for unit in tables.units:
+        once = twice = thrice = 0
+        for cell in unit:
+            mask = cands[cell]
+            thrice |= twice & mask
+            twice |= once & mask
+            once |= mask
+
+        # Two places is the fewest an open digit can have
+        pairs = twice & ~thrice
+        if pairs:
+            return (unit, pairs & -pairs)
+
+        while twice:
+            bit = twice & -twice
+            twice ^= bit
+            places = 0
+            for cell in unit:
+                if cands[cell] & bit:
+                    places += 1
+            if places < fewest:
+                best = (unit, bit)
+                fewest = places
+    return best
+
+def MakeExactCover(box=3):
+    """Build the link arrays of the empty Sudoku exact cover matrix
+    @keyword box: box size of the grid
+    @return: (left, right, up, down, column, size, rowid, first)
+    @see: L{DancingLinks}
+
+    """
+    width = box * box
+    ncells = width * width
+    ncols = 4 * ncells
+    headers = range(ncols + 1)
+    left = [idx - 1 for idx in headers]
+    left[0] = ncols
+    right = [idx + 1 for idx in headers]
+    right[ncols] = 0
+    up = list(headers)
+    down = list(headers)
+    column = list(headers)
+    rowid = [-1] * (ncols + 1)
+    size = [0] * (ncols + 1)
+    first = list()
+
+    for cell in range(ncells):
+        row, col = cell / width, cell % width
+        blk = (row / box) * box + col / box
+        for digit in range(width):
+            start = len(column)
+            first.append(start)
+            cols = (1 + cell, 1 + ncells + row * width + digit,
+                    1 + 2 * ncells + col * width + digit,
+                    1 + 3 * ncells + blk * width + digit)
+            for idx, col_hdr in enumerate(cols):
+                node = start + idx
+                # Link into the row
+                left.append(start + (idx - 1) % 4)
+                right.append(start + (idx + 1) % 4)
+                # Link at the bottom of the column
+                up.append(up[col_hdr])
+                down.append(col_hdr)
+                down[up[col_hdr]] = node
+                up[col_hdr] = node
+                column.append(col_hdr)
+                rowid.append(cell * width + digit)
+                size[col_hdr] += 1
+
+    return (left, right, up, down, column, size, rowid, first)
+
 def All(seq):
     """Are all the values in the sequence are true
     @note: for python < 2.5 compatibility
@@ -0,0 +1,464 @@
+###############################################################################
+# Name: strategy.py                                                           #
+# Purpose: Find logical deductions the way a person would solve a puzzle      #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2008 Cody Precord <staff@editra.org>                         #
+# License: wxWindows License                                                  #
+###############################################################################
+
+"""
+Human solving strategies for giving hints. Instead of searching for the
+solution, the strategies look for the next logical deduction that can be
+made from the pencil marks of the board, trying the simplest strategies
+first. Nothing is ever guessed, so a deduction can be explained to the
+player.
+
+The candidates of each cell are bitmasks like in the solvers bitmask engine
+(see L{solver.ENGINE_BITMASK}) and the strategies work on the same unit
+tables.
+
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__revision__ = "$Revision$"
+__scid__ = "$Id$"
+
+#-----------------------------------------------------------------------------#
+# Imports
+import itertools
+
+# Local Imports
+import solver
+
+#-----------------------------------------------------------------------------#
+# Globals
+
+# Strategy names
+STRATEGY_NAKED_SINGLE = "Naked Single"
+STRATEGY_HIDDEN_SINGLE = "Hidden Single"
+STRATEGY_POINTING = "Locked Candidates (Pointing)"
+STRATEGY_CLAIMING = "Locked Candidates (Claiming)"
+STRATEGY_NAKED_PAIR = "Naked Pair"
+STRATEGY_NAKED_TRIPLE = "Naked Triple"
+STRATEGY_HIDDEN_PAIR = "Hidden Pair"
+STRATEGY_HIDDEN_TRIPLE = "Hidden Triple"
+STRATEGY_XWING = "X-Wing"
+STRATEGY_SWORDFISH = "Swordfish"
+
+# Difficulty level of each strategy, used for rating puzzles
+LEVEL_SOLVED = 0        # Nothing left to do
+LEVEL_BACKTRACK = 7     # The strategies got stuck, a search was needed
+LEVELS = { STRATEGY_NAKED_SINGLE : 1,
+           STRATEGY_HIDDEN_SINGLE : 1,
+           STRATEGY_POINTING : 2,
+           STRATEGY_CLAIMING : 2,
+           STRATEGY_NAKED_PAIR : 3,
+           STRATEGY_HIDDEN_PAIR : 3,
+           STRATEGY_NAKED_TRIPLE : 4,
+           STRATEGY_HIDDEN_TRIPLE : 4,
+           STRATEGY_XWING : 5,
+           STRATEGY_SWORDFISH : 6 }
+
+# Highest level rated as each difficulty (Easy, Normal, Hard), anything
+# harder is Evil. Puzzles that need a search are rated Hard if it took no
+# more than BACKTRACK_HARD nodes.
+DIFFICULTY_LEVELS = (1, 2, 6)
+BACKTRACK_HARD = 30
+
+# Units as tuples of cell indexes
+COL_UNITS = solver.UNIT_CELLS[:9]
+ROW_UNITS = solver.UNIT_CELLS[9:18]
+BOX_UNITS = solver.UNIT_CELLS[18:]
+
+# Cell index => index of its row and column
+CELL_ROW = tuple(cell // 9 for cell in range(81))
+CELL_COL = tuple(cell % 9 for cell in range(81))
+
+# Box and line intersections as (cells, rest of the box, rest of the line)
+INTERSECTIONS = tuple((tuple([cell for cell in box if cell in line]),
+                       tuple([cell for cell in box if cell not in line]),
+                       tuple([cell for cell in line if cell not in box]))
+                      for box in BOX_UNITS
+                      for line in ROW_UNITS + COL_UNITS
+                      if set(box) & set(line))
+
+# Candidate mask => tuple of the single candidate masks in it
+MASK_BITS = tuple(tuple(1 << idx for idx in range(len(solver.DIGITS))
+                        if mask & (1 << idx))
+                  for mask in range(solver.ALL_DIGITS + 1))
+
+#-----------------------------------------------------------------------------#
+
+class Deduction(object):
+    """A step found by one of the strategies"""
+    def __init__(self, strategy, cells, placements=(), eliminations=()):
+        """Create the deduction
+        @param strategy: STRATEGY_* name
+        @param cells: indexes of the cells that make up the pattern
+        @keyword placements: list of (cell, digit) that can be filled in
+        @keyword eliminations: list of (cell, digit) candidates that can be
+                               removed
+
+        """
+        object.__init__(self)
+
+        # Attributes
+        self.strategy = strategy
+        self.cells = tuple(cells)
+        self.placements = list(placements)
+        self.eliminations = list(eliminations)
+
+    def __repr__(self):
+        return "<Deduction %s>" % self.GetDescription()
+
+    def GetDescription(self):
+        """Get a short description of the deduction
+        @return: string
+
+        """
+        if self.placements:
+            steps = ["%s=%s" % (CellName(cell), digit)
+                     for cell, digit in self.placements]
+        else:
+            steps = ["%s<>%s" % (CellName(cell), digit)
+                     for cell, digit in self.eliminations]
+        return "%s: %s" % (self.strategy, ", ".join(steps))
+
+    def GetEliminations(self):
+        """Get the candidates that can be removed
+        @return: list of (cell, digit)
+
+        """
+        return self.eliminations
+
+    def GetPlacements(self):
+        """Get the cells that can be filled in
+        @return: list of (cell, digit)
+
+        """
+        return self.placements
+
+    def GetStrategy(self):
+        """Get the name of the strategy that found the deduction
+        @return: STRATEGY_* name
+
+        """
+        return self.strategy
+
+#-----------------------------------------------------------------------------#
+
+def CellName(cell):
+    """Get the row and column name of a cell (0 => 'r1c1')
+    @param cell: cell index
+    @return: string
+
+    """
+    return "r%dc%d" % (CELL_ROW[cell] + 1, CELL_COL[cell] + 1)
+
+def GetCandidates(puzzle):
+    """Get the pencil marks of a board, the digits that are not the value
+    of any of a cells peers.
+    @param puzzle: 81 character puzzle string
+    @return: (list of candidate masks, list of bool cell is filled)
+
+    """
+    cands = [solver.ALL_DIGITS] * 81
+    filled = [False] * 81
+    for cell, digit in enumerate(puzzle[:81]):
+        if digit in solver.DIGIT_MASK:
+            cands[cell] = solver.DIGIT_MASK[digit]
+            filled[cell] = True
+
+    for cell in range(81):
+        if filled[cell]:
+            mask = ~cands[cell]
+            for peer in solver.CELL_PEERS[cell]:
+                if not filled[peer]:
+                    cands[peer] &= mask
+    return cands, filled
+
+def ApplyDeduction(cands, filled, deduction):
+    """Make the placements and eliminations of a deduction on a board
+    @param cands: list of candidate masks
+    @param filled: list of bool cell is filled
+    @param deduction: L{Deduction}
+
+    """
+    for cell, digit in deduction.eliminations:
+        cands[cell] &= ~solver.DIGIT_MASK[digit]
+
+    for cell, digit in deduction.placements:
+        bit = solver.DIGIT_MASK[digit]
+        cands[cell] = bit
+        filled[cell] = True
+        for peer in solver.CELL_PEERS[cell]:
+            if not filled[peer]:
+                cands[peer] &= ~bit
+
+def FindDeduction(cands, filled):
+    """Find the simplest deduction that can be made on a board
+    @param cands: list of candidate masks
+    @param filled: list of bool cell is filled
+    @return: L{Deduction} or None if none of the strategies found one or the
+             board has a contradiction
+
+    """
+    for cell in range(81):
+        if not cands[cell]:
+            return None
+
+    for strategy, args in STRATEGIES:
+        deduction = strategy(cands, filled, *args)
+        if deduction is not None:
+            return deduction
+    return None
+
+def FindHint(puzzle):
+    """Find the deductions that lead to filling in the next cell of a board.
+    Deductions that only remove candidates are applied to the pencil marks
+    until one of the strategies can fill in a cell.
+    @param puzzle: 81 character puzzle string
+    @return: list of L{Deduction} ending with one that has placements, or
+             None if the strategies can not make any progress
+
+    """
+    cands, filled = GetCandidates(puzzle)
+    steps = list()
+    while True:
+        deduction = FindDeduction(cands, filled)
+        if deduction is None:
+            return None
+
+        steps.append(deduction)
+        if deduction.placements:
+            return steps
+
+        ApplyDeduction(cands, filled, deduction)
+
+def GetDifficulty(rating):
+    """Get the difficulty level that a rating falls in
+    @param rating: (level, steps, nodes) from L{RatePuzzle}
+    @return: difficulty (0 Easy, 1 Normal, 2 Hard, 3 Evil)
+
+    """
+    level, nodes = rating[0], rating[2]
+    for diff, highest in enumerate(DIFFICULTY_LEVELS):
+        if level <= highest:
+            return diff
+
+    if level == LEVEL_BACKTRACK and nodes > BACKTRACK_HARD:
+        return len(DIFFICULTY_LEVELS)
+    return len(DIFFICULTY_LEVELS) - 1
+
+def RatePuzzle(puzzle):
+    """Rate how hard a puzzle is by solving it with the strategies, always
+    taking the simplest deduction. If the strategies get stuck the rest of
+    the puzzle is searched with the solver.
+    @param puzzle: 81 character puzzle string
+    @return: (level of the hardest strategy needed, number of deductions,
+              number of search nodes)
+
+    """
+    cands, filled = GetCandidates(puzzle)
+    level = LEVEL_SOLVED
+    steps = 0
+    while not solver.All(filled):
+        deduction = FindDeduction(cands, filled)
+        if deduction is None:
+            break
+
+        steps += 1
+        level = max(level, LEVELS[deduction.strategy])
+        ApplyDeduction(cands, filled, deduction)
+    else:
+        return (level, steps, 0)
+
+    board = ''.join([filled[cell] and solver.MASK_DIGIT[cands[cell]] or '.'
+                     for cell in range(81)])
+    search = solver.SudokuSolver(board, solver.ENGINE_BITMASK)
+    search.GetSolution()
+    return (LEVEL_BACKTRACK, steps, search.GetCounters()['nodes'])
+
+def Eliminations(cands, filled, cells, mask):
+    """Get the candidates of a mask that are in a group of cells
+    @param cands: list of candidate masks
+    @param filled: list of bool cell is filled
+    @param cells: cell indexes
+    @param mask: candidate mask of the digits to remove
+    @return: list of (cell, digit)
+
+    """
+    found = list()
+    for cell in cells:
+        if not filled[cell] and cands[cell] & mask:
+            for bit in MASK_BITS[cands[cell] & mask]:
+                found.append((cell, solver.MASK_DIGIT[bit]))
+    return found
+
+def OpenMask(cands, filled, cells):
+    """Get all the candidates of the open cells in a group
+    @param cands: list of candidate masks
+    @param filled: list of bool cell is filled
+    @param cells: cell indexes
+    @return: candidate mask
+
+    """
+    mask = 0
+    for cell in cells:
+        if not filled[cell]:
+            mask |= cands[cell]
+    return mask
+
+def DigitCells(cands, filled, unit, bit):
+    """Get the open cells of a unit that have a candidate
+    @param cands: list of candidate masks
+    @param filled: list of bool cell is filled
+    @param unit: cell indexes
+    @param bit: single candidate mask
+    @return: list of cell indexes
+
+    """
+    return [cell for cell in unit if not filled[cell] and cands[cell] & bit]
+
+#---- Strategies ----#
+
+def NakedSingle(cands, filled):
+    """Find an open cell with only one candidate left"""
+    for cell in range(81):
+        if not filled[cell] and solver.BIT_COUNT[cands[cell]] == 1:
+            return Deduction(STRATEGY_NAKED_SINGLE, (cell,),
+                             [(cell, solver.MASK_DIGIT[cands[cell]])])
+    return None
+
+def HiddenSingle(cands, filled):
+    """Find a digit that has only one place left in a unit"""
+    for unit in BOX_UNITS + ROW_UNITS + COL_UNITS:
+        once = twice = placed = 0
+        for cell in unit:
+            if filled[cell]:
+                placed |= cands[cell]
+            else:
+                twice |= once & cands[cell]
+                once |= cands[cell]
+
+        single = once & ~twice & ~placed
+        if single:
+            bit = MASK_BITS[single][0]
+            cell = DigitCells(cands, filled, unit, bit)[0]
+            return Deduction(STRATEGY_HIDDEN_SINGLE, unit,
+                             [(cell, solver.MASK_DIGIT[bit])])
+    return None
+
+def LockedCandidates(cands, filled):
+    """Find a digit whose places in a box are all on one line (pointing) or
+    whose places on a line are all in one box (claiming). The digit can be
+    removed from the rest of the line or box.
+
+    """
+    masks = [(OpenMask(cands, filled, cells), OpenMask(cands, filled, box),
+              OpenMask(cands, filled, line))
+             for cells, box, line in INTERSECTIONS]
+
+    for name, side, other in ((STRATEGY_POINTING, 1, 2),
+                              (STRATEGY_CLAIMING, 2, 1)):
+        for idx, mask in enumerate(masks):
+            locked = mask[0] & ~mask[side]
+            if not locked or not locked & mask[other]:
+                continue
+
+            cells = INTERSECTIONS[idx][0]
+            bit = MASK_BITS[locked & mask[other]][0]
+            found = Eliminations(cands, filled, INTERSECTIONS[idx][other],
+                                 bit)
+            return Deduction(name, DigitCells(cands, filled, cells, bit),
+                             eliminations=found)
+    return None
+
+def NakedSubset(cands, filled, size, name):
+    """Find a group of cells in a unit that have only as many candidates
+    between them as there are cells. Those candidates can be removed from
+    the rest of the unit.
+
+    """
+    for unit in solver.UNIT_CELLS:
+        open_cells = [cell for cell in unit if not filled[cell] and
+                      solver.BIT_COUNT[cands[cell]] <= size]
+        for cells in itertools.combinations(open_cells, size):
+            mask = 0
+            for cell in cells:
+                mask |= cands[cell]
+            if solver.BIT_COUNT[mask] != size:
+                continue
+            found = Eliminations(cands, filled,
+                                 [cell for cell in unit if cell not in cells],
+                                 mask)
+            if found:
+                return Deduction(name, cells, eliminations=found)
+    return None
+
+def HiddenSubset(cands, filled, size, name):
+    """Find a group of digits that only have as many places in a unit as
+    there are digits. The other candidates of those cells can be removed.
+
+    """
+    for unit in solver.UNIT_CELLS:
+        places = dict()
+        for cell in unit:
+            if not filled[cell]:
+                for bit in MASK_BITS[cands[cell]]:
+                    places.setdefault(bit, list()).append(cell)
+
+        digits = [bit for bit in sorted(places.keys())
+                  if len(places[bit]) <= size]
+        for bits in itertools.combinations(digits, size):
+            cells = set()
+            mask = 0
+            for bit in bits:
+                cells.update(places[bit])
+                mask |= bit
+            if len(cells) != size:
+                continue
+            found = Eliminations(cands, filled, sorted(cells),
+                                 solver.ALL_DIGITS & ~mask)
+            if found:
+                return Deduction(name, sorted(cells), eliminations=found)
+    return None
+
+def Fish(cands, filled, size, name):
+    """Find a digit whose places in a number of rows are all in the same
+    number of columns, or the other way around. The digit can be removed
+    from the rest of those columns (or rows).
+
+    """
+    for bit in MASK_BITS[solver.ALL_DIGITS]:
+        for bases, covers, index in ((ROW_UNITS, COL_UNITS, CELL_COL),
+                                     (COL_UNITS, ROW_UNITS, CELL_ROW)):
+            places = list()
+            for base in bases:
+                cells = DigitCells(cands, filled, base, bit)
+                if 2 <= len(cells) <= size:
+                    places.append(cells)
+
+            for group in itertools.combinations(places, size):
+                lines = set([index[cell] for cells in group for cell in cells])
+                if len(lines) != size:
+                    continue
+                pattern = [cell for cells in group for cell in cells]
+                others = [cell for line in sorted(lines)
+                          for cell in covers[line] if cell not in pattern]
+                found = Eliminations(cands, filled, others, bit)
+                if found:
+                    return Deduction(name, pattern, eliminations=found)
+    return None
+
+# Strategies in the order they are tried, simplest first, as
+# (function, extra arguments)
+STRATEGIES = ((NakedSingle, ()),
+              (HiddenSingle, ()),
+              (LockedCandidates, ()),
+              (NakedSubset, (2, STRATEGY_NAKED_PAIR)),
+              (HiddenSubset, (2, STRATEGY_HIDDEN_PAIR)),
+              (NakedSubset, (3, STRATEGY_NAKED_TRIPLE)),
+              (HiddenSubset, (3, STRATEGY_HIDDEN_TRIPLE)),
+              (Fish, (2, STRATEGY_XWING)),
+              (Fish, (3, STRATEGY_SWORDFISH)))
@@ -23,6 +23,8 @@ import wx
 
 # Local Imports
 import sudoku_cmn
+import solvecache
+import puzzle
 
 #-----------------------------------------------------------------------------#
 
@@ -65,6 +67,21 @@ class SudokuConfig(dict):
         """Get the icon resource directory"""
         return self.imgdir
 
+    def GetHistoryCoalesce(self):
+        """Get if consecutive moves in the same cell are merged in the
+        undo history.
+        @return: bool
+
+        """
+        return self.get('HISTORY_COALESCE', True)
+
+    def GetHistoryLimit(self):
+        """Get the max number of moves to keep in the undo history
+        @return: int
+
+        """
+        return self.get('HISTORY_LIMIT', puzzle.HISTORY_LIMIT)
+
     def GetInstallDir(self):
         """Get the installation directory"""
         return self.instdir
@@ -73,6 +90,10 @@ class SudokuConfig(dict):
         """Get the path of where the saved games are"""
         return self.savedir
 
+    def GetSolutionCacheFile(self):
+        """Get the path of the solution cache database"""
+        return os.path.join(self.cfgdir, solvecache.CACHE_FILE)
+
     def Load(self):
         """Load the on disk configuration pickle"""
         path = os.path.join(self.cfgdir, 'sudoku.cfg')
@@ -20,6 +20,7 @@ __scid__ = "$Id$"
 import os
 import sys
 import time
+import threading
 import webbrowser
 import wx
 
@@ -28,20 +29,31 @@ import proj_info
 import puzzle
 import sudoku_cmn
 import puzzledlg
+import strategy
 import Icons
-from solver import SudokuSolver
+from solver import SudokuSolver, CancelToken, ENGINE_BITMASK
+from solvecache import SolutionCache, CacheError
 
 #-----------------------------------------------------------------------------#
 # Globals
 _ = wx.GetTranslation
 
+SOLVE_TIMEOUT = 30  # Seconds to search for a solution before giving up
+
 #-----------------------------------------------------------------------------#
 
 class SudokuGameEvent(wx.PyCommandEvent):
     """Class for events generated during game play"""
-    def __init__(self, eventType, id):
+    def __init__(self, eventType, id, value=None):
         wx.PyCommandEvent.__init__(self, eventType, id)
 
+        # Attributes
+        self._value = value
+
+    def GetValue(self):
+        """Get the data attached to the event"""
+        return self._value
+
 # Event Types
 suEVT_NEW_BOARD = wx.NewEventType()
 EVT_NEW_BOARD = wx.PyEventBinder(suEVT_NEW_BOARD, 1)
@@ -52,6 +64,14 @@ EVT_MOVE_MADE = wx.PyEventBinder(suEVT_MOVE_MADE, 1)
 suEVT_GAME_COMPLETE = wx.NewEventType()
 EVT_GAME_COMPLETE = wx.PyEventBinder(suEVT_GAME_COMPLETE, 1)
 
+# Value is (cell, digit or None, description of the deduction or None)
+suEVT_HINT_READY = wx.NewEventType()
+EVT_HINT_READY = wx.PyEventBinder(suEVT_HINT_READY, 1)
+
+# Value is (request id, solution string or None)
+suEVT_SOLUTION_READY = wx.NewEventType()
+EVT_SOLUTION_READY = wx.PyEventBinder(suEVT_SOLUTION_READY, 1)
+
 #-----------------------------------------------------------------------------#
 
 class SudokuFrame(wx.Frame):
@@ -86,6 +106,8 @@ class SudokuFrame(wx.Frame):
         self.Bind(wx.EVT_TIMER, self.OnTimer)
         self.Bind(wx.EVT_MENU, lambda evt: self.NewGame(), id=wx.ID_NEW)
         self.Bind(wx.EVT_MENU, lambda evt: self.ClearGame(), id=wx.ID_CLEAR)
+        self.Bind(wx.EVT_MENU, lambda evt: self.canvas.Undo(), id=wx.ID_UNDO)
+        self.Bind(wx.EVT_MENU, lambda evt: self.canvas.Redo(), id=wx.ID_REDO)
         self.Bind(wx.EVT_MENU, self.OnOpen, id=wx.ID_OPEN)
         self.Bind(wx.EVT_MENU, self.OnSave, id=wx.ID_SAVE)
         self.Bind(wx.EVT_MENU, self.OnSave, id=wx.ID_SAVEAS)
@@ -110,13 +132,15 @@ class SudokuFrame(wx.Frame):
                   id=sudoku_cmn.ID_EVIL)
 
         for menu_id in (sudoku_cmn.ID_EASY, sudoku_cmn.ID_NORMAL,
-                        sudoku_cmn.ID_HARD, sudoku_cmn.ID_EVIL, wx.ID_HELP):
+                        sudoku_cmn.ID_HARD, sudoku_cmn.ID_EVIL, wx.ID_HELP,
+                        wx.ID_UNDO, wx.ID_REDO):
             self.Bind(wx.EVT_UPDATE_UI, self.OnUpdateDiffUI, id=menu_id)
 
         # Game Event Handlers
         self.Bind(EVT_NEW_BOARD, lambda evt: self.UpdateMoves())
         self.Bind(EVT_MOVE_MADE, self.OnMove)
         self.Bind(EVT_GAME_COMPLETE, self.OnPuzzleSoved)
+        self.Bind(EVT_HINT_READY, self.OnHintReady)
 
     def __del__(self):
         if self._timer.IsRunning():
@@ -140,6 +164,10 @@ class SudokuFrame(wx.Frame):
         toolbar.AddSimpleTool(wx.ID_CLEAR, Icons.getClearBitmap(),
                               _("Clear Puzzle"),
                               _("Restart the current puzzle"))
+        toolbar.AddSimpleTool(wx.ID_UNDO, Icons.getUndoBitmap(),
+                              _("Undo"), _("Undo the last move"))
+        toolbar.AddSimpleTool(wx.ID_REDO, Icons.getRedoBitmap(),
+                              _("Redo"), _("Redo the last undone move"))
         toolbar.AddSeparator()
         toolbar.AddSimpleTool(wx.ID_HELP, Icons.getHelpBitmap(),
                               _("Hints"), _("Get a hint"))
@@ -168,6 +196,11 @@ class SudokuFrame(wx.Frame):
         gamem.Append(wx.ID_CLEAR, _("&Clear Puzzle") + "\tCtrl+R",
                      _("Restart the current puzzle"))
         gamem.AppendSeparator()
+        gamem.Append(wx.ID_UNDO, _("&Undo") + "\tCtrl+Z",
+                     _("Undo the last move"))
+        gamem.Append(wx.ID_REDO, _("&Redo") + "\tCtrl+Y",
+                     _("Redo the last undone move"))
+        gamem.AppendSeparator()
         gamem.Append(wx.ID_OPEN, _("&Open Puzzle") + u"...\tCtrl+O",
                      _("Load a saved puzzle"))
         gamem.AppendSeparator()
@@ -242,22 +275,12 @@ class SudokuFrame(wx.Frame):
         return "%s:%s:%s" % (hours, mins, secs)
 
     def GiveHint(self):
-        """Try to solve the current puzzle and give a hint"""
-        selection = self.canvas.GetSelection()
-        if selection is None:
-            return
+        """Give a hint for the next cell that can be worked out, or for the
+        selected cell if no logical deduction can be found. The hint is
+        given when the canvas sends the EVT_HINT_READY event.
 
-        # Search for a hint
-        board = self.canvas.GetPuzzleBoard()
-        solver = SudokuSolver(str(board))
-        solution = solver.GetValue(selection)
-        if solution is not None:
-            if solution != self.canvas.GetCellValue(selection):
-                self._hints += 1
-                self.canvas.MakeMove( selection, solution)
-        else:
-            wx.Bell()
-            # TODO Show why no hints can be given
+        """
+        self.canvas.RequestHint(self.canvas.GetSelection())
 
     def LoadPuzzle(self, board):
         """Load the given game board
@@ -282,10 +305,22 @@ class SudokuFrame(wx.Frame):
 
     def OnClose(self, evt):
         """Handle when the dialog is closing"""
+        self.canvas.CancelSolve()
         wx.GetApp().Set('WINPOS', self.GetPositionTuple())
         wx.GetApp().Save()
         evt.Skip()
 
+    def OnHintReady(self, evt):
+        """Handle when the canvas has given or failed to give a hint"""
+        digit, reason = evt.GetValue()[1:]
+        if digit is not None:
+            self._hints += 1
+            if reason is not None:
+                self.SetStatusText(_("Hint: %s") % reason)
+        else:
+            wx.Bell()
+            # TODO Show why no hints can be given
+
     def OnMove(self, evt):
         """Handle when a move is made in the canvas"""
         if not self._timer.IsRunning():
@@ -375,8 +410,11 @@ class SudokuFrame(wx.Frame):
             evt.Check(sudoku_cmn.DIFF_MAP[e_id] == self._difficulty)
             evt.Enable(len(puzzle.ThePuzzleManager.GetPuzzles(sudoku_cmn.DIFF_MAP[e_id])))
         elif e_id == wx.ID_HELP:
-            evt.Enable(self.canvas.GetSelection() is not None and \
-                       self._difficulty < puzzle.DIFFICULTY_HARD)
+            evt.Enable(self.canvas.IsEnabled())
+        elif e_id == wx.ID_UNDO:
+            evt.Enable(self.canvas.IsEnabled() and self.canvas.CanUndo())
+        elif e_id == wx.ID_REDO:
+            evt.Enable(self.canvas.IsEnabled() and self.canvas.CanRedo())
         else:
             evt.Skip()
 
@@ -434,6 +472,10 @@ class SudokuCanvas(wx.PyControl):
         self._cells = None       # Board cells
         self._active = None      # Currently active cell
         self._moves = 0          # Number of moves made
+        self._solution = None    # Solution of the initial board
+        self._solveid = 0        # Id of the latest solve request
+        self._solvecancel = None # CancelToken of the running solve
+        self._pendinghint = None # (cell,) to give a hint for after the solve
 
         # Setup
         self.SetCursor(wx.StockCursor(wx.CURSOR_HAND))
@@ -444,6 +486,7 @@ class SudokuCanvas(wx.PyControl):
         self.Bind(wx.EVT_LEFT_UP, self.OnMouseClick)
         self.Bind(wx.EVT_KEY_UP, self.OnKeyUp)
         self.Bind(wx.EVT_LEAVE_WINDOW, lambda evt: wx.SetCursor(wx.NullCursor))
+        self.Bind(EVT_SOLUTION_READY, self.OnSolutionReady)
 
     #---- Private Methods ----#
 
@@ -460,7 +503,7 @@ class SudokuCanvas(wx.PyControl):
     def __DrawOneCell(gc, cell):
         """Draw one cell
         @param gc: GCDC to draw in
-        @param cell: L{puzzle.CellData} object
+        @param cell: L{puzzle.CellView} object
 
         """
         # Store Current Pen/Brush
@@ -489,17 +532,93 @@ class SudokuCanvas(wx.PyControl):
         gc.SetPen(wx.TRANSPARENT_PEN)
         gc.DrawRectangle(cell.x, cell.y, cell.w, cell.h)
 
-        # Draw Cell Value
-        gc.DrawLabel(cell.val, cell.GetRect(), wx.ALIGN_CENTER)
+        # Draw Cell Value, in red if the digit is already in the same row,
+        # column or box.
+        if cell.conflict:
+            text = gc.GetTextForeground()
+            gc.SetTextForeground(wx.RED)
+            gc.DrawLabel(cell.val, cell.GetRect(), wx.ALIGN_CENTER)
+            gc.SetTextForeground(text)
+        else:
+            gc.DrawLabel(cell.val, cell.GetRect(), wx.ALIGN_CENTER)
 
         # Restore the pen and brush
         gc.SetBrush(brush)
         gc.SetPen(pen)
 
+    def __GiveHint(self, cell, digit, reason=None):
+        """Fill in a cell and tell the parent with an EVT_HINT_READY event
+        @param cell: cell index or None
+        @param digit: value to fill in or None if no hint could be found
+        @keyword reason: description of the deduction behind the hint
+
+        """
+        if digit is not None:
+            self._active = cell
+            self._cells.ActivateCell(cell)
+            self.MakeMove(cell, digit)
+
+        wx.PostEvent(self.GetParent(),
+                     SudokuGameEvent(suEVT_HINT_READY, self.GetId(),
+                                     (cell, digit, reason)))
+
+    def __GiveSolutionHint(self, cell):
+        """Fill in a cell from the solution of the initial board
+        @param cell: cell index or None
+
+        """
+        digit = None
+        if self._solution is not None and cell is not None:
+            digit = self._solution[cell]
+            if digit == self.GetCellValue(cell):
+                # Already correct
+                return
+        self.__GiveHint(cell, digit)
+
+    def __StepHistory(self, cell):
+        """Update the canvas after a move was undone or redone
+        @param cell: index of the changed cell or None if nothing changed
+
+        """
+        if cell is None:
+            return
+
+        self._moves += 1
+        self.Refresh()
+        wx.PostEvent(self.GetParent(),
+                     SudokuGameEvent(suEVT_MOVE_MADE, self.GetId()))
+        self.CheckComplete()
+
     #---- End Private Methods ----#
 
     #---- Public Methods ----#
 
+    def CanRedo(self):
+        """Are there undone moves that can be redone
+        @return: bool
+
+        """
+        return self._cells.GetHistory().CanRedo()
+
+    def CanUndo(self):
+        """Are there moves that can be undone
+        @return: bool
+
+        """
+        return self._cells.GetHistory().CanUndo()
+
+    def CancelSolve(self):
+        """Cancel the running solve of the initial board and drop its result
+        if it is already on its way.
+
+        """
+        self._solveid += 1
+        self._pendinghint = None
+        if self._solvecancel is not None:
+            self._solvecancel.Cancel()
+            self._solvecancel = None
+            self.SetCursor(wx.StockCursor(wx.CURSOR_HAND))
+
     def CheckComplete(self):
         """Check if the board is completed or not. If the board has been
         solved this method will post a EVT_GAME_COMPLETE event, if it is
@@ -549,12 +668,22 @@ class SudokuCanvas(wx.PyControl):
         return self._board
 
     def GetPuzzleBoard(self):
-        """Get the L{puzzle.PuzzleBoard} of L{puzzle.CellData} which represents
-        the current state of the puzzle.
+        """Get the L{puzzle.PuzzleBoard} which represents the current state of
+        the puzzle.
 
         """
         return self._cells
 
+    def GetMistakes(self):
+        """Get the cells that have a value that does not match the solution
+        @return: list of cell indexes (empty if the solution is not known)
+
+        """
+        if self._solution is None:
+            return list()
+        return [ cell for cell in range(len(self._solution))
+                 if self.IsMistake(cell) ]
+
     def GetMoves(self):
         """Get how many moves have been made in the current game
         @return: int
@@ -625,6 +754,13 @@ class SudokuCanvas(wx.PyControl):
                     return cell
         return None
 
+    def GetSolution(self):
+        """Get the solution of the initial board
+        @return: string or None if it is not known (yet)
+
+        """
+        return self._solution
+
     def GetSelection(self):
         """Get the index of the currently selected cell
         @return: int or None
@@ -641,17 +777,17 @@ class SudokuCanvas(wx.PyControl):
 
         """
         self.Enable()
-        cords = self.__CalculateCords()
-        cell_list = puzzle.PuzzleBoard()
-
+        if state != self._board or \
+           (self._solution is None and self._solvecancel is None):
+            self.StartSolve(state)
+        self._pendinghint = None
         self._board = state
-        for cell, val in enumerate(state):
-            cord = cords[cell]
-            if not val.isdigit():
-                val = ''
-            readonly = len(val) > 0
-            cell_list.append(puzzle.CellData(cord[:2], cord[2:], readonly, val))
 
+        cell_list = puzzle.PuzzleBoard(state=state)
+        cell_list.SetCellRects(self.__CalculateCords())
+        history = cell_list.GetHistory()
+        history.SetLimit(wx.GetApp().GetHistoryLimit())
+        history.SetCoalesce(wx.GetApp().GetHistoryCoalesce())
         self._cells = cell_list
         self._moves = 0
         wx.PostEvent(self.GetParent(),
@@ -672,8 +808,86 @@ class SudokuCanvas(wx.PyControl):
                          SudokuGameEvent(suEVT_MOVE_MADE, self.GetId()))
             self.CheckComplete()
 
+    def IsMistake(self, cell):
+        """Check if the value of a cell does not match the solution
+        @param cell: cell index
+        @return: bool (False if the solution is not known)
+
+        """
+        val = self.GetCellValue(cell)
+        return self._solution is not None and val != '' and \
+               val != self._solution[cell]
+
+    def Redo(self):
+        """Redo the last undone move, it counts as a move"""
+        self.__StepHistory(self._cells.Redo())
+
+    def RequestHint(self, cell):
+        """Fill in the next cell that can be worked out from the board with
+        the solving strategies and send an EVT_HINT_READY event to the
+        parent. If the strategies can not find one the value of the given
+        cell is filled in from the solution of the initial board instead.
+        Hints are only given once the search for the solution is done, so
+        that the users mistakes can be left out of the deductions and every
+        hint can be checked against the solution.
+        @param cell: cell index or None
+
+        """
+        if self._solution is None:
+            if self._solvecancel is not None:
+                self._pendinghint = (cell,)
+                self.SetCursor(wx.StockCursor(wx.CURSOR_ARROWWAIT))
+            else:
+                # The board has no known solution to check a hint against
+                self.__GiveSolutionHint(cell)
+            return
+
+        board = list(str(self._cells))
+        for mistake in self.GetMistakes():
+            board[mistake] = '.'
+
+        steps = strategy.FindHint(''.join(board))
+        if steps is not None:
+            hint = steps[-1]
+            hcell, digit = hint.GetPlacements()[0]
+            if digit == self._solution[hcell]:
+                self.__GiveHint(hcell, digit, hint.GetDescription())
+                return
+        self.__GiveSolutionHint(cell)
+
+    def StartSolve(self, state):
+        """Start searching for the solution of a board on a background
+        thread. The solution is kept for hints and for checking moves.
+        @param state: puzzle string
+
+        """
+        self.CancelSolve()
+        self._solution = None
+        self._solvecancel = CancelToken()
+        SolveThread(self, self._solveid, state, self._solvecancel,
+                    wx.GetApp().GetSolutionCacheFile()).start()
+
     #---- Event Handlers ----#
 
+    def OnSolutionReady(self, evt):
+        """Keep the solution found by a L{SolveThread} and give any hint
+        that was waiting for it.
+        @param evt: EVT_SOLUTION_READY
+
+        """
+        solveid, solution = evt.GetValue()
+        if solveid != self._solveid:
+            # A different board was loaded while searching
+            return
+
+        self._solution = solution
+        self._solvecancel = None
+        self.SetCursor(wx.StockCursor(wx.CURSOR_HAND))
+        if self._pendinghint is not None:
+            cell = self._pendinghint[0]
+            self._pendinghint = None
+            self.RequestHint(cell)
+
     def OnKeyUp(self, evt):
         """Handle the key up events for entering numbers
         @param evt: wx.KeyEvent
@@ -785,13 +999,74 @@ class SudokuCanvas(wx.PyControl):
         self._moves = max(0, moves)
 
     def SetValue(self, cell, value):
-        """Set the value of the given cell
+        """Set the value of the given cell, the change is not recorded in
+        the undo history.
         @param cell: int (0 >= cell <= 80)
         @param value: string digit or empty string
 
         """
-        self._cells[cell].SetValue(value)
-        self.Refresh(False, self._cells[cell].GetRect())
+        if self._cells[cell].CanEdit():
+            self._cells.SetValue(cell, value, record=False)
+            self.Refresh(False, self._cells[cell].GetRect())
+
+    def Undo(self):
+        """Undo the last move, it counts as a move"""
+        self.__StepHistory(self._cells.Undo())
+
+#-----------------------------------------------------------------------------#
+
+class SolveThread(threading.Thread):
+    """Searches for the solution of a board off of the main thread and
+    reports the result to a window with an EVT_SOLUTION_READY event.
+
+    """
+    def __init__(self, target, solveid, board, cancel, cachefile=None):
+        """Create the thread
+        @param target: window to send the EVT_SOLUTION_READY event to
+        @param solveid: id of the request to send back with the result
+        @param board: puzzle string
+        @param cancel: L{CancelToken} to stop the search with
+        @keyword cachefile: path of the solution cache to check first
+
+        """
+        threading.Thread.__init__(self)
+
+        # Attributes
+        self._target = target
+        self._solveid = solveid
+        self._board = board
+        self._cancel = cancel
+        self._cachefile = cachefile
+
+        # Setup
+        self.setDaemon(True)
+
+    def run(self):
+        """Search for the solution and post the result"""
+        # The cache connection belongs to this thread
+        cache = None
+        if self._cachefile is not None:
+            try:
+                cache = SolutionCache(self._cachefile)
+            except CacheError, msg:
+                sudoku_cmn.DebugP("[sudoku][err] %s" % msg)
+
+        solver = SudokuSolver(self._board, ENGINE_BITMASK, cache=cache)
+        solver.SetLimits(timeout=SOLVE_TIMEOUT, cancel=self._cancel)
+        solution = solver.GetSolution()
+        if solution is not None:
+            solution = ''.join(solution)
+
+        if cache is not None:
+            stats = cache.GetStats()
+            sudoku_cmn.DebugP("[sudoku][info] solution cache hits: %d "
+                              "misses: %d" % (stats['hits'], stats['misses']))
+            cache.Close()
+
+        if not self._cancel.IsCancelled():
+            evt = SudokuGameEvent(suEVT_SOLUTION_READY, self._target.GetId(),
+                                  (self._solveid, solution))
+            wx.PostEvent(self._target, evt)
 
 #-----------------------------------------------------------------------------#
 # Helper Functions
@@ -0,0 +1,250 @@
+###############################################################################
+# Name: vecsolve.py                                                           #
+# Purpose: Constraint propagation over many puzzles at once with NumPy        #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2008 Cody Precord <staff@editra.org>                         #
+# License: wxWindows License                                                  #
+###############################################################################
+
+"""
+Vectorized puzzle solving for bulk validation and rating of puzzle
+collections. A collection is loaded into an (N, 81) array of candidate
+bitmasks (see L{solver.ENGINE_BITMASK}) and the naked and hidden single
+rules are applied as array operations across all the boards at once. Boards
+that propagation alone can not finish are searched breadth first as arrays
+too, and any that still remain are handed to the scalar solver.
+
+@note: requires numpy
+
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__revision__ = "$Revision$"
+__scid__ = "$Id$"
+
+#-----------------------------------------------------------------------------#
+# Imports
+import numpy
+
+# Local Imports
+import solver
+
+#-----------------------------------------------------------------------------#
+# Globals
+
+# Board status values returned by PropagateBoards
+STATUS_INVALID = -1     # Propagation found a contradiction
+STATUS_OPEN = 0         # Propagation got stuck, search is needed
+STATUS_SOLVED = 1       # Every cell has a single candidate
+
+# Candidate mask => number of candidates in it
+POPCOUNT = numpy.array(solver.BIT_COUNT, dtype=numpy.uint8)
+
+# Single candidate mask of each digit
+BITS = numpy.array([1 << idx for idx in range(len(solver.DIGITS))],
+                   dtype=numpy.uint16)
+
+# (27, 9) cells of each unit, (81, 20) peers of each cell and (81, 3) units
+# of each cell, all built from the solvers unit layout.
+UNITS = numpy.array(solver.UNIT_CELLS, dtype=numpy.intp)
+PEERS = numpy.array(solver.CELL_PEERS, dtype=numpy.intp)
+CELL_UNITS = numpy.array([[uidx for uidx, unit in enumerate(solver.UNIT_CELLS)
+                           if cell in unit]
+                          for cell in range(81)], dtype=numpy.intp)
+
+# Puzzle character => initial candidate mask
+CHAR_MASK = numpy.empty(256, dtype=numpy.uint16)
+CHAR_MASK.fill(solver.ALL_DIGITS)
+for _digit, _mask in solver.DIGIT_MASK.iteritems():
+    CHAR_MASK[ord(_digit)] = _mask
+
+# Candidate mask => puzzle character ('.' unless a single candidate)
+MASK_CHAR = numpy.empty(solver.ALL_DIGITS + 1, dtype=numpy.uint8)
+MASK_CHAR.fill(ord('.'))
+for _mask, _digit in solver.MASK_DIGIT.iteritems():
+    MASK_CHAR[_mask] = ord(_digit)
+del _digit, _mask
+
+#-----------------------------------------------------------------------------#
+
+def LoadBoards(puzzles):
+    """Load a list of puzzle strings into an array of candidate masks
+    @param puzzles: list of 81 character puzzle strings
+    @return: (N, 81) uint16 array
+
+    """
+    for puzzle in puzzles:
+        if len(puzzle) != 81:
+            raise ValueError("Puzzles must be 81 characters long")
+
+    data = numpy.frombuffer(''.join(puzzles), dtype=numpy.uint8)
+    return CHAR_MASK[data.reshape(-1, 81)]
+
+def BoardsToStrings(cands):
+    """Convert an array of candidate masks back to puzzle strings with the
+    solved cells filled in.
+    @param cands: (N, 81) array of candidate masks
+    @return: list of strings
+
+    """
+    data = MASK_CHAR[cands].tostring()
+    return [data[idx:idx + 81] for idx in range(0, len(data), 81)]
+
+def PropagateBoards(cands):
+    """Apply the naked and hidden single rules to all the boards until none
+    of them changes any more.
+    @param cands: (N, 81) array of candidate masks
+    @return: (new (N, 81) array of candidate masks, (N,) array of STATUS_*)
+
+    """
+    cands = cands.copy()
+    status = numpy.zeros(len(cands), dtype=numpy.int8)
+    active = numpy.arange(len(cands))
+    while len(active):
+        board = cands[active]
+        new = PropagateStep(board)
+        bad = FindContradictions(new)
+        changed = (new != board).any(axis=1)
+        cands[active] = new
+        status[active[bad]] = STATUS_INVALID
+        active = active[changed & ~bad]
+
+    solved = (POPCOUNT[cands] == 1).all(axis=1) & (status == STATUS_OPEN)
+    status[solved] = STATUS_SOLVED
+    return cands, status
+
+def PropagateStep(cands):
+    """Apply one round of the naked and hidden single rules
+    @param cands: (N, 81) array of candidate masks
+    @return: new (N, 81) array of candidate masks
+
+    """
+    # Remove the value of every solved cell from its peers
+    single = POPCOUNT[cands] == 1
+    solved = numpy.where(single, cands, 0)
+    taken = numpy.zeros_like(cands)
+    for idx in range(PEERS.shape[1]):
+        taken |= solved[:, PEERS[:, idx]]
+    cands = numpy.where(single, cands, cands & ~taken)
+
+    # A digit with only one place in a unit must be assigned there
+    once, twice = UnitCoverage(cands[:, UNITS])
+    hidden = once & ~twice
+    only = numpy.zeros_like(cands)
+    for idx in range(CELL_UNITS.shape[1]):
+        only |= cands & hidden[:, CELL_UNITS[:, idx]]
+    cands = numpy.where(only != 0, only, cands)
+
+    # Contradiction: two digits need the same cell
+    return numpy.where(POPCOUNT[only] > 1, 0, cands).astype(numpy.uint16)
+
+def FindContradictions(cands):
+    """Find the boards that can not be solved any more
+    @param cands: (N, 81) array of candidate masks
+    @return: (N,) bool array
+
+    """
+    # A cell has no candidates left
+    bad = (cands == 0).any(axis=1)
+
+    # A digit has no place left in a unit
+    units = cands[:, UNITS]
+    once = UnitCoverage(units)[0]
+    bad |= (once != solver.ALL_DIGITS).any(axis=1)
+
+    # A digit is the value of two cells in a unit
+    twice = UnitCoverage(numpy.where(POPCOUNT[units] == 1, units, 0))[1]
+    bad |= (twice != 0).any(axis=1)
+    return bad
+
+def UnitCoverage(units):
+    """Find the digits that are candidates anywhere in each unit and those
+    that are candidates in more than one cell of it.
+    @param units: (N, 27, 9) array of the candidate masks of each unit
+    @return: ((N, 27) mask of digits seen once or more,
+              (N, 27) mask of digits seen twice or more)
+
+    """
+    once = numpy.zeros(units.shape[:2], dtype=numpy.uint16)
+    twice = once.copy()
+    for idx in range(units.shape[2]):
+        mask = units[:, :, idx]
+        twice |= once & mask
+        once |= mask
+    return once, twice
+
+def SearchBoards(cands, limit=65536):
+    """Search boards that propagation could not finish breadth first, all at
+    once. Each round splits every open board on its cell with the fewest
+    candidates, into one board with that cells lowest candidate assigned and
+    one with it removed, and propagates all the new boards together.
+    @param cands: (N, 81) array of candidate masks
+    @keyword limit: give up once more than this many boards are open
+    @return: (N, 81) array of solved boards and (N,) array of STATUS_*
+             (STATUS_OPEN for the boards that were given up on)
+
+    """
+    result = cands.copy()
+    status = numpy.zeros(len(cands), dtype=numpy.int8)
+    owner = numpy.arange(len(cands))
+    while len(cands):
+        cands, state = PropagateBoards(cands)
+
+        # Keep the first solution found for each board
+        done = numpy.flatnonzero(state == STATUS_SOLVED)
+        first = numpy.unique(owner[done], return_index=True)[1]
+        done = done[first]
+        done = done[status[owner[done]] == STATUS_OPEN]
+        result[owner[done]] = cands[done]
+        status[owner[done]] = STATUS_SOLVED
+
+        keep = (state == STATUS_OPEN) & (status[owner] == STATUS_OPEN)
+        cands = cands[keep]
+        owner = owner[keep]
+        if len(cands) * 2 > limit:
+            break
+
+        # Split each board on its unsolved cell with the fewest candidates
+        counts = POPCOUNT[cands].astype(numpy.int8)
+        counts[counts == 1] = len(solver.DIGITS) + 1
+        cell = counts.argmin(axis=1)
+        rows = numpy.arange(len(cands))
+        mask = cands[rows, cell]
+        low = mask & (~mask + 1)
+        assign = cands.copy()
+        assign[rows, cell] = low
+        cands[rows, cell] = mask ^ low
+        cands = numpy.concatenate((assign, cands))
+        owner = numpy.concatenate((owner, owner))
+
+    # Boards with no open branches left have no solution
+    status[numpy.setdiff1d(numpy.flatnonzero(status == STATUS_OPEN),
+                           owner)] = STATUS_INVALID
+    return result, status
+
+def SolveBoards(puzzles, chunksize=4096, engine=solver.ENGINE_BITMASK):
+    """Solve a list of puzzles, propagating and searching chunks of them as
+    arrays and using the scalar solver for any boards the array search gave
+    up on.
+    @param puzzles: list of 81 character puzzle strings
+    @keyword chunksize: number of boards to solve at a time
+    @keyword engine: solver engine to search the unfinished boards with
+    @return: list of solution strings (None for unsolvable puzzles)
+
+    """
+    results = list()
+    for start in range(0, len(puzzles), chunksize):
+        chunk = puzzles[start:start + chunksize]
+        cands, status = SearchBoards(LoadBoards(chunk), chunksize * 16)
+        for puzzle, board, state in zip(chunk, BoardsToStrings(cands),
+                                        status):
+            if state == STATUS_INVALID:
+                results.append(None)
+            elif state == STATUS_SOLVED:
+                results.append(board)
+            else:
+                solution = solver.SudokuSolver(puzzle, engine).GetSolution()
+                if solution is not None:
+                    solution = ''.join(solution)
+                results.append(solution)
+    return results